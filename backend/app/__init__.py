@@ -16,8 +16,13 @@ def create_app(config_class=Config):
     # Initialize extensions
     db.init_app(app)
     jwt.init_app(app)
-    CORS(app)
-    socketio.init_app(app, cors_allowed_origins="*")
+    CORS(app, expose_headers=['X-Next-Cursor', 'X-Unread-Count'])
+    socketio.init_app(
+        app,
+        cors_allowed_origins="*",
+        message_queue=app.config.get('SOCKETIO_MESSAGE_QUEUE'),
+        channel=app.config.get('SOCKETIO_CHANNEL', 'flask-socketio')
+    )
 
     with app.app_context():
         # Import routes
@@ -27,6 +32,7 @@ def create_app(config_class=Config):
         from .routes.admin import admin_bp
         from .routes.notification import notification_bp
         from .routes.matching import matching_bp
+        from .routes import socket_events  # registers the Socket.IO handlers
 
         # Register blueprints
         app.register_blueprint(auth_bp, url_prefix='/api/auth')
@@ -36,8 +42,36 @@ def create_app(config_class=Config):
         app.register_blueprint(notification_bp, url_prefix='/api/notifications')
         app.register_blueprint(matching_bp, url_prefix='/api/matching')
 
-        # Create database tables
+        # Create database tables, then add columns and indexes new to existing ones
         db.create_all()
+        from .utils.schema import upgrade_schema
+        upgrade_schema()
+
+        # Install optional R*Tree location indexes (SQLite only)
+        if app.config.get('SPATIAL_RTREE_ENABLED'):
+            from .services.spatial_rtree import install_spatial_rtrees
+            install_spatial_rtrees()
+
+        # Install the trigger-maintained dashboard aggregates (SQLite only)
+        if app.config.get('MATERIALIZED_STATISTICS_ENABLED'):
+            from .services.statistics import install_materialized_statistics
+            install_materialized_statistics()
+
+        # Load the in-memory donor snapshot used by matching
+        if app.config.get('DONOR_SNAPSHOT_ENABLED'):
+            from .services.donor_snapshot import donor_snapshot
+            donor_snapshot.max_age = app.config['DONOR_SNAPSHOT_MAX_AGE']
+            donor_snapshot.rebuild()
+
+    # Deliver queued real-time notifications in the background
+    if app.config.get('NOTIFICATION_DISPATCHER_ENABLED'):
+        from .services.notification_dispatcher import notification_dispatcher
+        notification_dispatcher.init_app(app)
+
+    # Prune expired notifications in the background
+    if app.config.get('NOTIFICATION_RETENTION_ENABLED'):
+        from .services.notification_retention import notification_retention
+        notification_retention.init_app(app)
 
     @app.errorhandler(Exception)
     def handle_error(error):
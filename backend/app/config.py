@@ -1,6 +1,14 @@
 import os
 from datetime import timedelta
 
+def _parse_day_counts(value):
+    """Parse 'type=days,type=days' into a {type: days} dict."""
+    counts = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        key, _, days = item.partition('=')
+        counts[key.strip()] = int(days)
+    return counts
+
 class Config:
     # Basic Flask config
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key')
@@ -9,6 +17,62 @@ class Config:
     basedir = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
     SQLALCHEMY_DATABASE_URI = f'sqlite:///{os.path.join(basedir, "bloodconnect.db")}'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Spatial index config - SQLite R*Tree mirror of donor/hospital locations
+    SPATIAL_RTREE_ENABLED = os.getenv('SPATIAL_RTREE_ENABLED', 'true').lower() == 'true'
+
+    # Admin statistics - aggregate tables maintained by SQLite triggers
+    MATERIALIZED_STATISTICS_ENABLED = os.getenv('MATERIALIZED_STATISTICS_ENABLED', 'true').lower() == 'true'
+
+    # Matching config - in-memory donor snapshot, rebuilt after MAX_AGE seconds.
+    # It is the candidate source for matching and donor radius search; when
+    # disabled those queries read the donors table, through the R*Tree when
+    # installed.
+    DONOR_SNAPSHOT_ENABLED = os.getenv('DONOR_SNAPSHOT_ENABLED', 'true').lower() == 'true'
+    DONOR_SNAPSHOT_MAX_AGE = int(os.getenv('DONOR_SNAPSHOT_MAX_AGE', '300'))
+
+    # Notification outbox dispatcher - background Socket.IO delivery. Every
+    # worker may run one; the holder of a LEASE (seconds) renewed through the
+    # database dispatches and the others stand by. An empty outbox is polled
+    # read-only, backing off from INTERVAL to IDLE_INTERVAL seconds.
+    NOTIFICATION_DISPATCHER_ENABLED = os.getenv('NOTIFICATION_DISPATCHER_ENABLED', 'true').lower() == 'true'
+    NOTIFICATION_DISPATCH_BATCH_SIZE = int(os.getenv('NOTIFICATION_DISPATCH_BATCH_SIZE', '500'))
+    NOTIFICATION_DISPATCH_INTERVAL = float(os.getenv('NOTIFICATION_DISPATCH_INTERVAL', '0.5'))
+    NOTIFICATION_DISPATCH_IDLE_INTERVAL = float(os.getenv('NOTIFICATION_DISPATCH_IDLE_INTERVAL', '5'))
+    NOTIFICATION_DISPATCH_MAX_ATTEMPTS = int(os.getenv('NOTIFICATION_DISPATCH_MAX_ATTEMPTS', '5'))
+    NOTIFICATION_DISPATCH_LEASE = int(os.getenv('NOTIFICATION_DISPATCH_LEASE', '30'))
+
+    # Notification coalescing - unread notifications of a type absorb new ones
+    # for WINDOW seconds (0 disables); idempotency keys are kept for DAYS
+    NOTIFICATION_COALESCE_WINDOW = int(os.getenv('NOTIFICATION_COALESCE_WINDOW', '600'))
+    NOTIFICATION_IDEMPOTENCY_DAYS = int(os.getenv('NOTIFICATION_IDEMPOTENCY_DAYS', '7'))
+
+    # Notification retention - read notifications older than their type's TTL
+    # (days) are deleted, or archived when ARCHIVE is set. VACUUM is '',
+    # 'incremental' or 'full'. Opt-in: enable it on one process only, since
+    # it deletes rows.
+    NOTIFICATION_RETENTION_ENABLED = os.getenv('NOTIFICATION_RETENTION_ENABLED', 'false').lower() == 'true'
+    NOTIFICATION_RETENTION_INTERVAL = int(os.getenv('NOTIFICATION_RETENTION_INTERVAL', '3600'))
+    NOTIFICATION_RETENTION_DAYS = int(os.getenv('NOTIFICATION_RETENTION_DAYS', '90'))
+    NOTIFICATION_RETENTION_TTLS = _parse_day_counts(os.getenv(
+        'NOTIFICATION_RETENTION_TTLS',
+        'blood_request=30,emergency=14,donation_reminder=30'
+    ))
+    NOTIFICATION_RETENTION_ARCHIVE = os.getenv('NOTIFICATION_RETENTION_ARCHIVE', 'false').lower() == 'true'
+    NOTIFICATION_RETENTION_BATCH_SIZE = int(os.getenv('NOTIFICATION_RETENTION_BATCH_SIZE', '1000'))
+    NOTIFICATION_RETENTION_VACUUM = os.getenv('NOTIFICATION_RETENTION_VACUUM', '').lower()
+    
+    # Bulk user import - rows per transaction and password hashing processes
+    # (0 uses one per CPU)
+    USER_IMPORT_CHUNK_SIZE = int(os.getenv('USER_IMPORT_CHUNK_SIZE', '1000'))
+    USER_IMPORT_HASH_WORKERS = int(os.getenv('USER_IMPORT_HASH_WORKERS', '0'))
+    
+    # Socket.IO config - set MESSAGE_QUEUE (e.g. redis://localhost:6379/0, needs
+    # the redis package) so several workers share rooms; unset keeps events
+    # in-process. Needed with several workers: only the dispatcher holding the
+    # lease emits, and the queue carries its room events to every worker.
+    SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE') or None
+    SOCKETIO_CHANNEL = os.getenv('SOCKETIO_CHANNEL', 'flask-socketio')
     
     # JWT config
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key')
@@ -21,6 +21,13 @@ class Donation(db.Model):
     hospital = db.relationship('Hospital', back_populates='donations')
     request = db.relationship('BloodRequest', back_populates='donations')
 
+    __table_args__ = (
+        # Serve the hospital and donor donation histories, newest first
+        db.Index('ix_donations_hospital_id_donation_date', 'hospital_id', 'donation_date'),
+        db.Index('ix_donations_donor_id_donation_date', 'donor_id', 'donation_date'),
+        db.Index('ix_donations_request_id', 'request_id'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
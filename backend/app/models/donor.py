@@ -23,6 +23,13 @@ class Donor(User):
         'polymorphic_identity': 'donor'
     }
 
+    __table_args__ = (
+        # Serves radius searches: equality on availability and blood type,
+        # then a latitude range with longitude checked inside the index
+        db.Index('ix_donors_available_blood_type_location',
+                 'is_available', 'blood_type', 'latitude', 'longitude'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -1,4 +1,5 @@
 from app import db
+from sqlalchemy import event, func, select
 from datetime import datetime
 
 class Notification(db.Model):
@@ -8,4 +9,100 @@ class Notification(db.Model):
     message = db.Column(db.Text, nullable=False)
     type = db.Column(db.String(50))
     is_read = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow) 
\ No newline at end of file
+    count = db.Column(db.Integer, default=1, nullable=False)  # notifications merged into this digest
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Serves the per-user feed, newest first, with id breaking ties
+        db.Index('ix_notification_user_id_created_at',
+                 'user_id', db.desc('created_at'), db.desc('id')),
+        # Serves the retention job's per-type expiry scans
+        db.Index('ix_notification_type_read_created_at', 'type', 'is_read', 'created_at'),
+    )
+
+class NotificationCounter(db.Model):
+    """Per-user count of unread notifications.
+
+    Kept in step by NotificationService inside the same transactions that
+    create, read or delete notifications, so the badge count is a single
+    primary key lookup.
+    """
+    __tablename__ = 'notification_counter'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    unread_count = db.Column(db.Integer, default=0, nullable=False)
+
+@event.listens_for(NotificationCounter.__table__, 'after_create')
+def _backfill_counters(target, connection, **kw):
+    """Seed the counters from existing notifications when the table is first created."""
+    connection.execute(target.insert().from_select(
+        ['user_id', 'unread_count'],
+        select(Notification.user_id, func.count())
+        .where(Notification.is_read == False)
+        .group_by(Notification.user_id)
+    ))
+
+class NotificationReceipt(db.Model):
+    """Idempotency keys already delivered to a user.
+
+    A notification sent again with a key the user already holds is dropped.
+    Receipts are pruned by the retention job once they are old enough that
+    a retried send can no longer arrive.
+    """
+    __tablename__ = 'notification_receipt'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    idempotency_key = db.Column(db.String(100), primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+class NotificationArchive(db.Model):
+    """Expired notifications moved out of the live table by the retention job."""
+    __tablename__ = 'notification_archive'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    title = db.Column(db.String(200), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    type = db.Column(db.String(50))
+    count = db.Column(db.Integer, default=1, nullable=False)
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+class NotificationOutbox(db.Model):
+    """Real-time events waiting to be pushed over Socket.IO.
+
+    Rows are written in the same transaction as the notifications they
+    announce and drained by the background NotificationDispatcher. Each
+    event targets one Socket.IO room: a user's own room or a broadcast room.
+    """
+    __tablename__ = 'notification_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    room = db.Column(db.String(100), nullable=False)
+    notification_id = db.Column(db.Integer)  # set for events announcing a notification
+    event = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON, nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    available_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_notification_outbox_available_at', 'available_at'),
+        db.Index('ix_notification_outbox_room', 'room'),
+        db.Index('ix_notification_outbox_notification_id', 'notification_id'),
+    )
+
+
+class NotificationDispatchLease(db.Model):
+    """The dispatcher process currently allowed to drain the outbox.
+
+    Every process may run a NotificationDispatcher; only the one holding an
+    unexpired lease dispatches, so each room keeps its event order. A lease
+    left by a dead process expires and is taken over.
+    """
+    __tablename__ = 'notification_dispatch_lease'
+
+    name = db.Column(db.String(50), primary_key=True)
+    owner = db.Column(db.String(100), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
@@ -19,7 +19,14 @@ class BloodRequest(db.Model):
     responses = db.relationship('DonorResponse', back_populates='request', lazy=True, cascade='all, delete-orphan')
     donations = db.relationship('Donation', back_populates='request', lazy=True)
 
-    def to_dict(self):
+    __table_args__ = (
+        # Serves the open request listings, newest first
+        db.Index('ix_blood_requests_status_created_at', 'status', 'created_at'),
+        # Serves a hospital's own requests by status (e.g. the fulfilled list)
+        db.Index('ix_blood_requests_hospital_id_status', 'hospital_id', 'status', 'updated_at'),
+    )
+
+    def to_dict(self, response_count=None):
         return {
             'id': self.id,
             'hospital_id': self.hospital_id,
@@ -31,7 +38,7 @@ class BloodRequest(db.Model):
             'description': self.description,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
-            'response_count': len(self.responses)
+            'response_count': len(self.responses) if response_count is None else response_count
         }
 
 class DonorResponse(db.Model):
@@ -48,6 +55,11 @@ class DonorResponse(db.Model):
     request = db.relationship('BloodRequest', back_populates='responses')
     donor = db.relationship('Donor', back_populates='responses')
 
+    __table_args__ = (
+        # Serves response counts per request and the one-response-per-donor check
+        db.Index('ix_donor_responses_request_id_donor_id', 'request_id', 'donor_id'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
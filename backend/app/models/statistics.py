@@ -0,0 +1,29 @@
+from app import db
+
+class StatisticCounter(db.Model):
+    """Named running totals behind the admin dashboard.
+
+    Names are 'donors', 'donors.<blood type>', 'hospitals', 'donations',
+    'open_requests' and 'open_requests.<urgency>'. Kept in step by the
+    triggers installed by app.services.statistics, inside the same
+    transactions as the writes they count.
+    """
+    __tablename__ = 'statistic_counter'
+
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, default=0, nullable=False)
+
+class DailyDonationStatistic(db.Model):
+    """Donations and units per donation day, hospital, blood type and status.
+
+    Maintained like StatisticCounter; the (day, ...) primary key serves the
+    time-series range scans.
+    """
+    __tablename__ = 'daily_donation_statistic'
+
+    day = db.Column(db.Date, primary_key=True)
+    hospital_id = db.Column(db.Integer, primary_key=True)
+    blood_type = db.Column(db.String(5), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    donations = db.Column(db.Integer, default=0, nullable=False)
+    units = db.Column(db.Integer, default=0, nullable=False)
@@ -16,6 +16,11 @@ class User(db.Model):
         'polymorphic_on': user_type
     }
 
+    __table_args__ = (
+        # Serves the newest-first user and donor listings
+        db.Index('ix_user_created_at', 'created_at'),
+    )
+
     def set_password(self, password):
         if not password:
             raise ValueError("Password cannot be empty")
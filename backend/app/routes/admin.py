@@ -2,16 +2,46 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app.models import User, Donor, Hospital, BloodRequest, Donation
-from datetime import datetime, timedelta
-from sqlalchemy import func
+from app.utils.pagination import filter_arg, keyset_page, page_args, page_headers
+from app.utils.streaming import stream_query
+from app.services.notification_dispatcher import notification_dispatcher
+from app.services.statistics import StatisticsService
+from app.services.user_import import UserImportService
+from app.utils.blood_types import BLOOD_TYPES
+from app.utils.constants import DONATION_STATUS
+import os
 
 admin_bp = Blueprint('admin', __name__)
+statistics_service = StatisticsService()
+user_import_service = UserImportService()
 
 def is_admin(user_id):
     """Check if user is an admin."""
     user = User.query.get(int(user_id))
     return user and user.is_admin
 
+def _serialize_user(u):
+    return {
+        'id': u.id,
+        'email': u.email,
+        'user_type': u.user_type,
+        'is_verified': u.is_verified,
+        'created_at': u.created_at.isoformat()
+    }
+
+def _users_query():
+    """Project the users matching the `type` and `verified` filters (ValueError on a bad filter)."""
+    user_type = filter_arg(request.args, 'type', ['donor', 'hospital'])
+    is_verified = request.args.get('verified', type=bool)
+    
+    query = db.session.query(User.id, User.email, User.user_type, User.is_verified, User.created_at)
+    
+    if user_type:
+        query = query.filter(User.user_type == user_type)
+    if is_verified is not None:
+        query = query.filter(User.is_verified == is_verified)
+    return query
+
 @admin_bp.route('/users', methods=['GET'])
 @jwt_required()
 def get_users():
@@ -20,27 +50,69 @@ def get_users():
         if not is_admin(user_id):
             return jsonify({'error': 'Admin access required'}), 403
 
-        user_type = request.args.get('type')
-        is_verified = request.args.get('verified', type=bool)
+        try:
+            limit, cursor = page_args(request.args)
+            users, next_cursor = keyset_page(_users_query(), User.created_at, User.id, limit, cursor)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        query = User.query
-        
-        if user_type:
-            query = query.filter_by(user_type=user_type)
-        if is_verified is not None:
-            query = query.filter_by(is_verified=is_verified)
-            
-        users = query.all()
+        return jsonify([_serialize_user(u) for u in users]), 200, page_headers(next_cursor)
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/users/export', methods=['GET'])
+@jwt_required()
+def export_users():
+    """Stream every matching user as a JSON array or NDJSON (?format=json|ndjson)."""
+    try:
+        user_id = get_jwt_identity()
+        if not is_admin(user_id):
+            return jsonify({'error': 'Admin access required'}), 403
+
+        try:
+            return stream_query(
+                _users_query().order_by(User.id),
+                _serialize_user,
+                format=request.args.get('format', 'json'),
+                filename='users'
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/users/import', methods=['POST'])
+@jwt_required()
+def import_users():
+    """Register donors and hospitals in bulk from a CSV or NDJSON file.
+
+    The file is sent as the multipart field `file` or as the raw request
+    body. Query parameters (all optional): format (csv or ndjson, taken
+    from the file name when omitted) and type, the user type of rows
+    without a user_type column. Rows that fail are reported by row number.
+    """
+    try:
+        user_id = get_jwt_identity()
+        if not is_admin(user_id):
+            return jsonify({'error': 'Admin access required'}), 403
+
+        upload = request.files.get('file')
+        stream = upload.stream if upload else request.stream
+        extension = os.path.splitext(upload.filename or '')[1][1:].lower() if upload else ''
         
-        return jsonify([{
-            'id': u.id,
-            'email': u.email,
-            'user_type': u.user_type,
-            'is_verified': u.is_verified,
-            'created_at': u.created_at.isoformat()
-        } for u in users]), 200
+        try:
+            rows = user_import_service.read_rows(stream, request.args.get('format') or extension or 'csv')
+            default_type = filter_arg(request.args, 'type', ['donor', 'hospital'])
+            report = user_import_service.import_users(rows, default_type)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        return jsonify(report), 200
 
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/hospitals/<int:hospital_id>/verify', methods=['POST'])
@@ -72,31 +144,49 @@ def get_statistics():
         if not is_admin(user_id):
             return jsonify({'error': 'Admin access required'}), 403
 
-        # Basic counts
-        total_donors = Donor.query.count()
-        total_hospitals = Hospital.query.count()
-        total_donations = Donation.query.count()
-        active_requests = BloodRequest.query.filter_by(status='open').count()
-        
-        # Blood type distribution
-        blood_type_stats = db.session.query(
-            Donor.blood_type,
-            func.count(Donor.id)
-        ).group_by(Donor.blood_type).all()
-        
-        # Recent activity
-        recent_donations = Donation.query\
-            .filter(Donation.created_at >= datetime.utcnow() - timedelta(days=30))\
-            .count()
-        
-        return jsonify({
-            'total_donors': total_donors,
-            'total_hospitals': total_hospitals,
-            'total_donations': total_donations,
-            'active_requests': active_requests,
-            'blood_type_distribution': dict(blood_type_stats),
-            'recent_donations': recent_donations
-        }), 200
+        return jsonify(statistics_service.dashboard()), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/notifications/dispatcher', methods=['GET'])
+@jwt_required()
+def get_notification_dispatcher():
+    """Get this worker's notification dispatcher state, delivery counters and lag."""
+    try:
+        user_id = get_jwt_identity()
+        if not is_admin(user_id):
+            return jsonify({'error': 'Admin access required'}), 403
+
+        return jsonify(notification_dispatcher.metrics()), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/statistics/donations', methods=['GET'])
+@jwt_required()
+def get_donation_statistics():
+    """Get donations and units per day, oldest day first.
+
+    Query parameters (all optional): days (default 30), hospital_id,
+    blood_type and status.
+    """
+    try:
+        user_id = get_jwt_identity()
+        if not is_admin(user_id):
+            return jsonify({'error': 'Admin access required'}), 403
+
+        try:
+            series = statistics_service.donation_series(
+                request.args.get('days', 30, type=int),
+                hospital_id=request.args.get('hospital_id', type=int),
+                blood_type=filter_arg(request.args, 'blood_type', BLOOD_TYPES),
+                status=filter_arg(request.args, 'status', list(DONATION_STATUS.values()))
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        return jsonify(series), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -2,12 +2,18 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app.models import Donor, BloodRequest, DonorResponse, Donation
+from app.services.blood_request import BloodRequestService
+from app.services.donation import DonationService
+from app.utils.constants import DONATION_STATUS, URGENCY_LEVELS
+from app.utils.pagination import filter_arg, keyset_page, page_args, page_headers
 import logging
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
 donor_bp = Blueprint('donor', __name__)
+blood_request_service = BloodRequestService()
+donation_service = DonationService()
 
 @donor_bp.route('/profile', methods=['GET'])
 @jwt_required()
@@ -77,7 +83,11 @@ def update_profile():
 @donor_bp.route('/donations', methods=['GET'])
 @jwt_required()
 def get_donations():
-    """Get donor's donation history."""
+    """Get a page of the donor's donation history, newest donation first.
+
+    Query parameters (all optional): status, limit and cursor; the next
+    page's cursor is returned in the X-Next-Cursor header.
+    """
     try:
         donor_id = get_jwt_identity()
         donor = Donor.query.get(int(donor_id))
@@ -85,17 +95,24 @@ def get_donations():
         if not donor:
             return jsonify({'error': 'Donor not found'}), 404
 
-        donations = Donation.query.filter_by(donor_id=donor.id)\
-            .order_by(Donation.donation_date.desc()).all()
+        try:
+            limit, cursor = page_args(request.args)
+            query = donation_service.donor_history_query(
+                donor.id,
+                status=filter_arg(request.args, 'status', list(DONATION_STATUS.values()))
+            )
+            donations, next_cursor = keyset_page(query, Donation.donation_date, Donation.id, limit, cursor)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
         return jsonify([{
             'id': d.id,
             'blood_type': d.blood_type,
             'units': d.units,
             'donation_date': d.donation_date.isoformat(),
-            'hospital_name': d.hospital.name,
+            'hospital_name': d.hospital_name,
             'notes': d.notes
-        } for d in donations]), 200
+        } for d in donations]), 200, page_headers(next_cursor)
 
     except Exception as e:
         logger.error(f"Error getting donation history: {str(e)}")
@@ -148,6 +165,11 @@ def update_availability():
 @donor_bp.route('/nearby-requests', methods=['GET'])
 @jwt_required()
 def get_nearby_requests():
+    """Get a page of open requests for the donor's blood type, newest first.
+
+    Query parameters (all optional): urgency, limit and cursor; the next
+    page's cursor is returned in the X-Next-Cursor header.
+    """
     try:
         donor_id = get_jwt_identity()
         donor = Donor.query.get(int(donor_id))
@@ -156,12 +178,19 @@ def get_nearby_requests():
             return jsonify({'error': 'Donor not found'}), 404
 
         # Get matching blood requests
-        requests = BloodRequest.query.filter_by(
-            blood_type=donor.blood_type,
-            status='open'
-        ).order_by(BloodRequest.created_at.desc()).all()
-
-        return jsonify([r.to_dict() for r in requests]), 200
+        try:
+            limit, cursor = page_args(request.args)
+            requests, next_cursor = blood_request_service.list_requests(
+                blood_type=donor.blood_type,
+                urgency=filter_arg(request.args, 'urgency', list(URGENCY_LEVELS.values())),
+                limit=limit,
+                cursor=cursor
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        return jsonify([r.to_dict(response_count=count) for r, count in requests]), 200, \
+            page_headers(next_cursor)
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
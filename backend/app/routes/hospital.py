@@ -2,7 +2,14 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app.models import Hospital, BloodRequest, DonorResponse, Donation, Donor
+from app.services.blood_request import BloodRequestService
+from app.services.donation import DonationService
 from app.services.notification import NotificationService
+from app.services.realtime import broadcast_to_compatible_donors
+from app.utils.blood_types import BLOOD_TYPES
+from app.utils.constants import DONATION_STATUS, REQUEST_STATUS, URGENCY_LEVELS
+from app.utils.pagination import filter_arg, keyset_page, page_args, page_headers
+from app.utils.streaming import stream_query
 import logging
 from datetime import datetime
 
@@ -10,6 +17,8 @@ from datetime import datetime
 logger = logging.getLogger(__name__)
 
 hospital_bp = Blueprint('hospital', __name__)
+blood_request_service = BloodRequestService()
+donation_service = DonationService()
 
 @hospital_bp.route('/profile', methods=['GET', 'PUT'])
 @jwt_required()
@@ -39,12 +48,24 @@ def profile():
 
 @hospital_bp.route('/requests', methods=['GET'])
 def get_requests():
-    """Get all blood requests."""
+    """Get a page of blood requests, newest first.
+
+    Query parameters (all optional): status (default open), blood_type,
+    urgency, limit and cursor. The next page's cursor is returned in the
+    X-Next-Cursor header.
+    """
     try:
-        # Get all active requests (not cancelled or fulfilled)
-        requests = BloodRequest.query.filter(
-            BloodRequest.status == 'open'
-        ).order_by(BloodRequest.created_at.desc()).all()
+        try:
+            limit, cursor = page_args(request.args)
+            requests, next_cursor = blood_request_service.list_requests(
+                status=filter_arg(request.args, 'status', list(REQUEST_STATUS.values())) or 'open',
+                blood_type=filter_arg(request.args, 'blood_type', BLOOD_TYPES),
+                urgency=filter_arg(request.args, 'urgency', list(URGENCY_LEVELS.values())),
+                limit=limit,
+                cursor=cursor
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         # Convert requests to dictionary format
         requests_data = [{
@@ -57,11 +78,11 @@ def get_requests():
             'created_at': req.created_at.isoformat(),
             'hospital_name': req.hospital.name,
             'location': req.hospital.address,
-            'responses': len(req.responses)
-        } for req in requests]
+            'responses': response_count
+        } for req, response_count in requests]
         
-        logger.info(f"Fetched {len(requests_data)} active requests")
-        return jsonify(requests_data), 200
+        logger.info(f"Fetched {len(requests_data)} requests")
+        return jsonify(requests_data), 200, page_headers(next_cursor)
 
     except Exception as e:
         logger.error(f"Error fetching requests: {str(e)}")
@@ -99,6 +120,26 @@ def create_request():
         )
         
         db.session.add(new_request)
+        db.session.flush()
+
+        # Push the request to nearby compatible donors, committed with it
+        broadcast_to_compatible_donors(
+            new_request.blood_type,
+            'blood_request',
+            {
+                'id': new_request.id,
+                'hospital_id': hospital.id,
+                'hospital_name': hospital.name,
+                'blood_type': new_request.blood_type,
+                'units_needed': new_request.units_needed,
+                'urgency_level': new_request.urgency_level,
+                'latitude': hospital.latitude,
+                'longitude': hospital.longitude,
+                'created_at': new_request.created_at.isoformat()
+            },
+            latitude=hospital.latitude,
+            longitude=hospital.longitude
+        )
         db.session.commit()
         
         response_data = {
@@ -154,39 +195,68 @@ def record_donation():
             return jsonify({'error': 'Hospital not found'}), 404
 
         data = request.get_json()
-        donation = Donation(
-            donor_id=data['donor_id'],
-            hospital_id=hospital.id,
-            request_id=data.get('request_id'),
-            blood_type=data['blood_type'],
-            units=data['units'],
-            donation_date=data['donation_date'],
-            notes=data.get('notes')
-        )
+        donation_ids, errors = donation_service.record_donations(hospital.id, [data])
+        if errors:
+            return jsonify({'error': 'Invalid donation', 'details': errors[0]['errors']}), 400
         
-        db.session.add(donation)
+        db.session.commit()
         
-        # Update donor's last donation date
-        donor = Donor.query.get(data['donor_id'])
-        if donor:
-            donor.last_donation_date = donation.donation_date
-            donor.is_available = False  # Make donor unavailable after donation
+        return jsonify({
+            'message': 'Donation recorded successfully',
+            'donation': Donation.query.get(donation_ids[0]).to_dict()
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@hospital_bp.route('/donations/batch', methods=['POST'])
+@jwt_required()
+def record_donations():
+    """Record up to MAX_BATCH_SIZE donations in one transaction.
+
+    The body is {"donations": [...]}, each record shaped like a
+    POST /donations body. Nothing is saved if any record is invalid; the
+    response then lists the errors of each invalid record by index.
+    """
+    try:
+        hospital_id = get_jwt_identity()
+        hospital = Hospital.query.get(int(hospital_id))
+        
+        if not hospital:
+            return jsonify({'error': 'Hospital not found'}), 404
+
+        data = request.get_json() or {}
+        items = data.get('donations')
+        if not isinstance(items, list) or not 1 <= len(items) <= donation_service.MAX_BATCH_SIZE:
+            return jsonify({
+                'error': f'donations must be a list of 1 to {donation_service.MAX_BATCH_SIZE} records'
+            }), 400
+
+        donation_ids, errors = donation_service.record_donations(hospital.id, items)
+        if errors:
+            return jsonify({'error': 'Invalid donations', 'details': errors}), 400
         
         db.session.commit()
         
         return jsonify({
-            'message': 'Donation recorded successfully',
-            'donation': donation.to_dict()
+            'message': 'Donations recorded successfully',
+            'donation_ids': donation_ids
         }), 201
 
     except Exception as e:
         db.session.rollback()
+        logger.error(f"Error recording donations: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 @hospital_bp.route('/available-donors', methods=['GET'])
 @jwt_required()
 def get_available_donors():
-    """Get list of available donors."""
+    """Get a page of available donors, newest first.
+
+    Query parameters (all optional): blood_type, limit and cursor; the next
+    page's cursor is returned in the X-Next-Cursor header.
+    """
     try:
         hospital_id = get_jwt_identity()
         hospital = Hospital.query.get(int(hospital_id))
@@ -195,7 +265,15 @@ def get_available_donors():
             return jsonify({'error': 'Hospital not found'}), 404
 
         # Get available donors
-        donors = Donor.query.filter_by(is_available=True).all()
+        try:
+            limit, cursor = page_args(request.args)
+            blood_type = filter_arg(request.args, 'blood_type', BLOOD_TYPES)
+            query = Donor.query.filter_by(is_available=True)
+            if blood_type:
+                query = query.filter_by(blood_type=blood_type)
+            donors, next_cursor = keyset_page(query, Donor.created_at, Donor.id, limit, cursor)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         return jsonify([{
             'id': donor.id,
@@ -203,7 +281,7 @@ def get_available_donors():
             'bloodType': donor.blood_type,
             'lastDonation': donor.last_donation_date.isoformat() if donor.last_donation_date else None,
             'distance': None  # Calculate distance if needed
-        } for donor in donors])
+        } for donor in donors]), 200, page_headers(next_cursor)
 
     except Exception as e:
         logger.error(f"Error getting available donors: {str(e)}")
@@ -386,10 +464,7 @@ def get_fulfilled_requests():
         if not hospital:
             return jsonify({'error': 'Hospital not found'}), 404
 
-        fulfilled_requests = BloodRequest.query.filter_by(
-            hospital_id=hospital.id,
-            status='fulfilled'
-        ).order_by(BloodRequest.updated_at.desc()).all()
+        fulfilled_requests = donation_service.fulfilled_requests_query(hospital.id).all()
         
         return jsonify([{
             'id': req.id,
@@ -397,7 +472,7 @@ def get_fulfilled_requests():
             'units': req.units_needed,
             'urgency': req.urgency_level,
             'fulfilledAt': req.updated_at.isoformat(),
-            'donorName': req.donations[0].donor.name if req.donations else None,
+            'donorName': req.donor_name,
             'description': req.description
         } for req in fulfilled_requests]), 200
 
@@ -408,7 +483,11 @@ def get_fulfilled_requests():
 @hospital_bp.route('/donations', methods=['GET'])
 @jwt_required()
 def get_donation_history():
-    """Get hospital's donation history."""
+    """Get a page of the hospital's donation history, newest donation first.
+
+    Query parameters (all optional): blood_type, status, limit and cursor;
+    the next page's cursor is returned in the X-Next-Cursor header.
+    """
     try:
         hospital_id = get_jwt_identity()
         hospital = Hospital.query.get(int(hospital_id))
@@ -416,12 +495,54 @@ def get_donation_history():
         if not hospital:
             return jsonify({'error': 'Hospital not found'}), 404
 
-        donations = Donation.query.filter_by(
-            hospital_id=hospital.id
-        ).order_by(Donation.donation_date.desc()).all()
+        try:
+            limit, cursor = page_args(request.args)
+            query = donation_service.hospital_history_query(
+                hospital.id,
+                blood_type=filter_arg(request.args, 'blood_type', BLOOD_TYPES),
+                status=filter_arg(request.args, 'status', list(DONATION_STATUS.values()))
+            )
+            donations, next_cursor = keyset_page(query, Donation.donation_date, Donation.id, limit, cursor)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        return jsonify([donation.to_dict() for donation in donations]), 200
+        return jsonify([donation_service.row_to_dict(row) for row in donations]), 200, \
+            page_headers(next_cursor)
 
     except Exception as e:
         logger.error(f"Error fetching donation history: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@hospital_bp.route('/donations/export', methods=['GET'])
+@jwt_required()
+def export_donation_history():
+    """Stream the hospital's whole donation history as a JSON array or NDJSON.
+
+    Query parameters (all optional): format (json or ndjson), blood_type
+    and status.
+    """
+    try:
+        hospital_id = get_jwt_identity()
+        hospital = Hospital.query.get(int(hospital_id))
+        
+        if not hospital:
+            return jsonify({'error': 'Hospital not found'}), 404
+
+        try:
+            query = donation_service.hospital_history_query(
+                hospital.id,
+                blood_type=filter_arg(request.args, 'blood_type', BLOOD_TYPES),
+                status=filter_arg(request.args, 'status', list(DONATION_STATUS.values()))
+            )
+            return stream_query(
+                query,
+                donation_service.row_to_dict,
+                format=request.args.get('format', 'json'),
+                filename='donations'
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+    except Exception as e:
+        logger.error(f"Error exporting donation history: {str(e)}")
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
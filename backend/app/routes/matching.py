@@ -4,16 +4,47 @@ from app.services.matching import MatchingService
 from app.models.hospital import Hospital
 from app.models.donor import Donor
 from app.models.request import BloodRequest
+from app.utils.geolocation import calculate_distances
+from app.utils.validators import validate_coordinates
+from sqlalchemy.orm import joinedload
 
 matching_bp = Blueprint('matching', __name__)
 matching_service = MatchingService()
 
+BATCH_MATCH_LIMIT = 20  # Default matches returned per request in batch matching
+MAX_BATCH_MATCH_LIMIT = 100
+
+def _serialize_donor_match(match):
+    return {
+        'donor_id': match['donor'].id,
+        'name': match['donor'].name,
+        'blood_type': match['donor'].blood_type,
+        'distance': round(match['distance'], 1),
+        'score': round(match['score'], 2),
+        'last_donation': match['donor'].last_donation_date.isoformat() 
+            if match['donor'].last_donation_date else None
+    }
+
+def _ranking_args():
+    """Read the optional `limit` and `cursor` query parameters.
+
+    Raises ValueError if limit is given but is not a positive integer.
+    """
+    limit = request.args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            raise ValueError('limit must be a positive integer')
+    return limit, request.args.get('cursor')
+
 @matching_bp.route('/match-donors/<int:request_id>', methods=['GET'])
 @jwt_required()
 def get_matching_donors(request_id):
     """Get matching donors for a specific blood request."""
-    current_user = get_jwt_identity()
-    hospital = Hospital.query.get(current_user['user_id'])
+    hospital = Hospital.query.get(int(get_jwt_identity()))
     
     if not hospital:
         return jsonify({'error': 'Hospital not found'}), 404
@@ -22,31 +53,92 @@ def get_matching_donors(request_id):
     if not blood_request or blood_request.hospital_id != hospital.id:
         return jsonify({'error': 'Request not found'}), 404
     
-    matches = matching_service.find_matching_donors(blood_request)
+    try:
+        limit, cursor = _ranking_args()
+        matches = matching_service.find_matching_donors(blood_request, limit=limit, cursor=cursor)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     return jsonify({
-        'matches': [{
-            'donor_id': match['donor'].id,
-            'name': match['donor'].name,
-            'blood_type': match['donor'].blood_type,
-            'distance': round(match['distance'], 1),
-            'score': round(match['score'], 2),
-            'last_donation': match['donor'].last_donation_date.isoformat() 
-                if match['donor'].last_donation_date else None
-        } for match in matches]
+        'matches': [_serialize_donor_match(match) for match in matches],
+        'next_cursor': matching_service.donor_match_cursor(matches[-1])
+            if limit and len(matches) == limit else None
+    })
+
+@matching_bp.route('/match-donors/batch', methods=['POST'])
+@jwt_required()
+def get_batch_matching_donors():
+    """Get matching donors for many of the hospital's open blood requests in one pass.
+
+    Body (all optional): request_ids to match, or a region given by
+    latitude/longitude/radius (km) around the requesting hospitals, and the
+    number of matches to return per request (limit). Only the caller's own
+    requests are matched; ids of other hospitals' requests are skipped.
+    """
+    hospital = Hospital.query.get(int(get_jwt_identity()))
+    
+    if not hospital:
+        return jsonify({'error': 'Hospital not found'}), 404
+    
+    data = request.get_json(silent=True) or {}
+    
+    limit = data.get('limit', BATCH_MATCH_LIMIT)
+    if not isinstance(limit, int) or isinstance(limit, bool) or not 1 <= limit <= MAX_BATCH_MATCH_LIMIT:
+        return jsonify({'error': f'limit must be an integer between 1 and {MAX_BATCH_MATCH_LIMIT}'}), 400
+    
+    query = BloodRequest.query.options(joinedload(BloodRequest.hospital))\
+        .filter(BloodRequest.status == 'open', BloodRequest.hospital_id == hospital.id)
+    
+    request_ids = data.get('request_ids')
+    if request_ids is not None:
+        if not isinstance(request_ids, list) or not all(
+                isinstance(i, int) and not isinstance(i, bool) for i in request_ids):
+            return jsonify({'error': 'request_ids must be a list of integers'}), 400
+        query = query.filter(BloodRequest.id.in_(request_ids))
+    
+    blood_requests = query.order_by(BloodRequest.id).all()
+    
+    # Optionally keep only requests whose hospital lies in the region
+    if data.get('latitude') is not None and data.get('longitude') is not None:
+        if not validate_coordinates(data['latitude'], data['longitude']):
+            return jsonify({'error': 'Invalid coordinates'}), 400
+        radius = data.get('radius', matching_service.MAX_DISTANCE)
+        if not isinstance(radius, (int, float)) or radius <= 0:
+            return jsonify({'error': 'radius must be a positive number'}), 400
+        distances = calculate_distances(
+            float(data['latitude']),
+            float(data['longitude']),
+            [r.hospital.latitude for r in blood_requests],
+            [r.hospital.longitude for r in blood_requests]
+        ).tolist()
+        blood_requests = [r for r, distance in zip(blood_requests, distances) if distance <= radius]
+    
+    matches = matching_service.match_many(blood_requests, limit=limit)
+    
+    return jsonify({
+        'requests': [{
+            'request_id': r.id,
+            'hospital_id': r.hospital_id,
+            'blood_type': r.blood_type,
+            'urgency_level': r.urgency_level,
+            'matches': [_serialize_donor_match(match) for match in matches[r.id]]
+        } for r in blood_requests]
     })
 
 @matching_bp.route('/match-requests', methods=['GET'])
 @jwt_required()
 def get_matching_requests():
     """Get matching blood requests for a donor."""
-    current_user = get_jwt_identity()
-    donor = Donor.query.get(current_user['user_id'])
+    donor = Donor.query.get(int(get_jwt_identity()))
     
     if not donor:
         return jsonify({'error': 'Donor not found'}), 404
     
-    matches = matching_service.find_matching_requests(donor)
+    try:
+        limit, cursor = _ranking_args()
+        matches = matching_service.find_matching_requests(donor, limit=limit, cursor=cursor)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     return jsonify({
         'matches': [{
@@ -58,15 +150,16 @@ def get_matching_requests():
             'distance': round(match['distance'], 1),
             'score': round(match['score'], 2),
             'created_at': match['request'].created_at.isoformat()
-        } for match in matches]
+        } for match in matches],
+        'next_cursor': matching_service.request_match_cursor(matches[-1])
+            if limit and len(matches) == limit else None
     })
 
 @matching_bp.route('/emergency-matches/<int:request_id>', methods=['GET'])
 @jwt_required()
 def get_emergency_matches(request_id):
     """Get immediate matches for emergency requests."""
-    current_user = get_jwt_identity()
-    hospital = Hospital.query.get(current_user['user_id'])
+    hospital = Hospital.query.get(int(get_jwt_identity()))
     
     if not hospital:
         return jsonify({'error': 'Hospital not found'}), 404
@@ -78,9 +171,11 @@ def get_emergency_matches(request_id):
     if blood_request.urgency_level != 'critical':
         return jsonify({'error': 'Request is not marked as critical'}), 400
     
-    matches = matching_service.get_emergency_matches(blood_request)
+    result = matching_service.get_emergency_matches(blood_request)
     
     return jsonify({
+        'radius': result['radius'],
+        'partial': result['partial'],
         'matches': [{
             'donor_id': match['donor'].id,
             'name': match['donor'].name,
@@ -88,5 +183,5 @@ def get_emergency_matches(request_id):
             'distance': round(match['distance'], 1),
             'score': round(match['score'], 2),
             'phone': match['donor'].phone  # Include phone for emergency contact
-        } for match in matches]
+        } for match in result['matches']]
     }) 
\ No newline at end of file
@@ -1,33 +1,69 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, request, jsonify
+from datetime import datetime, timezone
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.services.notification import NotificationService
+from app.utils.pagination import page_args, page_headers
 
 notification_bp = Blueprint('notification', __name__)
 notification_service = NotificationService()
 
+FEED_PAGE_SIZE = 50  # Default notifications per page
+MAX_FEED_PAGE_SIZE = 200
+MAX_BULK_IDS = 1000  # Notification ids accepted by one bulk request
+UNREAD_COUNT_HEADER = 'X-Unread-Count'
+
 @notification_bp.route('/notifications', methods=['GET'])
 @jwt_required()
 def get_notifications():
-    """Get user's notifications."""
-    current_user = get_jwt_identity()
-    notifications = notification_service.get_user_notifications(current_user['user_id'])
-    
+    """Get a page of the user's notifications, newest first.
+
+    Query parameters (all optional): limit, cursor (the X-Next-Cursor
+    header of the previous page) and unread=true to list unread
+    notifications only. The unread count comes in the X-Unread-Count header.
+    """
+    user_id = int(get_jwt_identity())
+
+    try:
+        limit, cursor = page_args(request.args, default=FEED_PAGE_SIZE, maximum=MAX_FEED_PAGE_SIZE)
+        notifications = notification_service.get_user_notifications(
+            user_id,
+            limit=limit,
+            cursor=cursor,
+            unread_only=request.args.get('unread', '').lower() == 'true'
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    next_cursor = notification_service.notification_cursor(notifications[-1]) \
+        if len(notifications) == limit else None
+    headers = page_headers(next_cursor)
+    headers[UNREAD_COUNT_HEADER] = str(notification_service.get_unread_count(user_id))
+
     return jsonify([{
         'id': n.id,
         'title': n.title,
         'message': n.message,
         'type': n.type,
         'is_read': n.is_read,
-        'created_at': n.created_at.isoformat()
-    } for n in notifications])
+        'count': n.count,
+        'created_at': n.created_at.isoformat(),
+        'updated_at': n.updated_at.isoformat() if n.updated_at else None
+    } for n in notifications]), 200, headers
+
+@notification_bp.route('/notifications/unread-count', methods=['GET'])
+@jwt_required()
+def get_unread_count():
+    """Get the number of unread notifications."""
+    user_id = int(get_jwt_identity())
+    return jsonify({'unread_count': notification_service.get_unread_count(user_id)})
 
 @notification_bp.route('/notifications/<int:notification_id>/read', methods=['POST'])
 @jwt_required()
 def mark_notification_read(notification_id):
     """Mark a notification as read."""
-    current_user = get_jwt_identity()
-    success = notification_service.mark_as_read(notification_id, current_user['user_id'])
-    
+    user_id = int(get_jwt_identity())
+    success = notification_service.mark_as_read(notification_id, user_id)
+
     if success:
         return jsonify({'message': 'Notification marked as read'})
     return jsonify({'error': 'Notification not found'}), 404
@@ -36,12 +72,54 @@ def mark_notification_read(notification_id):
 @jwt_required()
 def delete_notification(notification_id):
     """Delete a notification."""
-    current_user = get_jwt_identity()
+    user_id = int(get_jwt_identity())
     success = notification_service.delete_notification(
         notification_id,
-        current_user['user_id']
+        user_id
     )
-    
+
     if success:
         return jsonify({'message': 'Notification deleted'})
-    return jsonify({'error': 'Notification not found'}), 404 
\ No newline at end of file
+    return jsonify({'error': 'Notification not found'}), 404
+
+@notification_bp.route('/notifications/read', methods=['POST'])
+@jwt_required()
+def mark_notifications_read():
+    """Mark many notifications as read in one statement.
+
+    Body: {"all": true} to clear the inbox, or {"notification_ids": [...]}.
+    """
+    user_id = int(get_jwt_identity())
+    data = request.get_json(silent=True) or {}
+
+    if data.get('all') is True:
+        updated = notification_service.mark_all_as_read(user_id)
+        return jsonify({'updated': updated})
+
+    notification_ids = data.get('notification_ids')
+    if not isinstance(notification_ids, list) or not all(
+            isinstance(i, int) and not isinstance(i, bool) for i in notification_ids):
+        return jsonify({'error': 'notification_ids must be a list of integers'}), 400
+    if not 1 <= len(notification_ids) <= MAX_BULK_IDS:
+        return jsonify({'error': f'notification_ids must hold 1 to {MAX_BULK_IDS} ids'}), 400
+
+    updated = notification_service.mark_many_as_read(notification_ids, user_id)
+    return jsonify({'updated': updated})
+
+@notification_bp.route('/notifications', methods=['DELETE'])
+@jwt_required()
+def delete_old_notifications():
+    """Delete every notification created before the `before` ISO datetime query parameter."""
+    user_id = int(get_jwt_identity())
+
+    try:
+        before = datetime.fromisoformat(request.args['before'])
+    except KeyError:
+        return jsonify({'error': 'before is required'}), 400
+    except ValueError:
+        return jsonify({'error': 'before must be an ISO 8601 datetime'}), 400
+    if before.tzinfo is not None:
+        before = before.astimezone(timezone.utc).replace(tzinfo=None)
+
+    deleted = notification_service.delete_older_than(user_id, before)
+    return jsonify({'deleted': deleted})
@@ -0,0 +1,51 @@
+from flask import request
+from flask_jwt_extended import decode_token
+from flask_socketio import join_room
+from app import db, socketio
+from app.models.user import User
+from app.models.donor import Donor
+from app.services.realtime import blood_type_room, donor_region_rooms, user_room
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _connection_token(auth):
+    """Get the access token from the Socket.IO auth payload or the query string."""
+    token = (auth or {}).get('token') if isinstance(auth, dict) else None
+    token = token or request.args.get('token')
+    if token and token.startswith('Bearer '):
+        token = token[len('Bearer '):]
+    return token
+
+@socketio.on('connect')
+def handle_connect(auth=None):
+    """Authenticate the connection with its access token and join the user's rooms.
+
+    Every user joins their own room; donors also join the room of their
+    blood type and, when located, the regional rooms around them, which
+    receive request broadcasts. Donors who move pick up their new regional
+    rooms on their next connection.
+    """
+    token = _connection_token(auth)
+    if not token:
+        raise ConnectionRefusedError('Missing access token')
+
+    try:
+        claims = decode_token(token)
+    except Exception as e:
+        logger.info(f"Socket connection refused: {str(e)}")
+        raise ConnectionRefusedError('Invalid access token')
+
+    if claims.get('type') != 'access' or not str(claims.get('sub', '')).isdigit():
+        raise ConnectionRefusedError('Invalid access token')
+
+    user = db.session.get(User, int(claims['sub']))
+    if not user or not user.is_active:
+        raise ConnectionRefusedError('User not found')
+
+    join_room(user_room(user.id))
+    if isinstance(user, Donor):
+        join_room(blood_type_room(user.blood_type))
+        if user.latitude is not None and user.longitude is not None:
+            for room in donor_region_rooms(user.blood_type, user.latitude, user.longitude):
+                join_room(room)
@@ -0,0 +1,48 @@
+from app import db
+from app.models.request import BloodRequest, DonorResponse
+from app.utils.pagination import DEFAULT_PAGE_SIZE, keyset_page
+from sqlalchemy import func, select
+from sqlalchemy.orm import contains_eager
+
+class BloodRequestService:
+    def response_count(self):
+        """Correlated count of a request's donor responses, answered from the request_id index."""
+        return select(func.count(DonorResponse.id))\
+            .where(DonorResponse.request_id == BloodRequest.id)\
+            .correlate(BloodRequest)\
+            .scalar_subquery()
+
+    def listing_query(self):
+        """Query (request, response_count) rows with each request's hospital loaded in the same statement.
+
+        Listings built on this run a single query however many rows they
+        return, instead of two lazy loads per request.
+        """
+        return db.session.query(BloodRequest, self.response_count().label('response_count'))\
+            .join(BloodRequest.hospital)\
+            .options(contains_eager(BloodRequest.hospital))
+
+    def list_requests(self, status='open', blood_type=None, urgency=None, hospital_id=None,
+                      limit=DEFAULT_PAGE_SIZE, cursor=None):
+        """Get a page of requests, newest first, as (request, response_count) pairs.
+
+        Returns (rows, next_cursor); raises ValueError for an invalid cursor.
+        """
+        query = self.listing_query()
+        if status:
+            query = query.filter(BloodRequest.status == status)
+        if blood_type:
+            query = query.filter(BloodRequest.blood_type == blood_type)
+        if urgency:
+            query = query.filter(BloodRequest.urgency_level == urgency)
+        if hospital_id is not None:
+            query = query.filter(BloodRequest.hospital_id == hospital_id)
+
+        return keyset_page(
+            query,
+            BloodRequest.created_at,
+            BloodRequest.id,
+            limit,
+            cursor,
+            key=lambda row: (row[0].created_at, row[0].id)
+        )
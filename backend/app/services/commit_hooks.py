@@ -0,0 +1,35 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+# Process-local caches (spatial index, donor snapshot, ...) are patched from
+# mapper events. Changes are staged on the session during flush and only
+# handed to the cache once the transaction commits, so rolled back writes
+# never leak into it.
+_appliers = {}
+
+def on_commit(key, apply):
+    """Register apply(changes) to receive the {item_id: state} changes staged under key."""
+    _appliers[key] = apply
+
+def stage(target, key, item_id, state):
+    """Stage a change for the session owning target; later stages for the same item win."""
+    session = object_session(target)
+    if session is None:
+        return
+    session.info.setdefault(key, {})[item_id] = state
+
+def stage_many(session, key, changes):
+    """Stage {item_id: state} changes written without the ORM (bulk inserts, set-based updates)."""
+    session.info.setdefault(key, {}).update(changes)
+
+@event.listens_for(Session, 'after_commit')
+def _apply_staged_changes(session):
+    for key, apply in _appliers.items():
+        changes = session.info.pop(key, None)
+        if changes:
+            apply(changes)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_staged_changes(session):
+    for key in _appliers:
+        session.info.pop(key, None)
@@ -0,0 +1,220 @@
+from datetime import datetime, timezone
+
+from app import db
+from app.models.donation import Donation
+from app.models.donor import Donor
+from app.models.hospital import Hospital
+from app.models.request import BloodRequest
+from app.services import donor_snapshot
+from app.utils.constants import DONATION_STATUS
+from app.utils.validators import validate_blood_type
+from sqlalchemy import func, insert, select, update
+
+# Name columns read straight from the subclass tables, without joining user
+_donors = Donor.__table__
+_hospitals = Hospital.__table__
+_donations = Donation.__table__
+
+class DonationService:
+    MAX_BATCH_SIZE = 1000
+
+    def _parse(self, item):
+        """Validate one donation record into (values, errors)."""
+        if not isinstance(item, dict):
+            return None, ['Donation must be an object']
+
+        errors = []
+        values = {
+            'donor_id': item.get('donor_id'),
+            'request_id': item.get('request_id'),
+            'blood_type': item.get('blood_type'),
+            'units': item.get('units', 1),
+            'status': item.get('status', DONATION_STATUS['COMPLETED']),
+            'notes': item.get('notes')
+        }
+        if not isinstance(values['donor_id'], int) or isinstance(values['donor_id'], bool):
+            errors.append('donor_id must be an integer')
+        if values['request_id'] is not None and (
+                not isinstance(values['request_id'], int) or isinstance(values['request_id'], bool)):
+            errors.append('request_id must be an integer')
+        if values['blood_type'] is not None and not validate_blood_type(values['blood_type']):
+            errors.append('Invalid blood type')
+        if not isinstance(values['units'], int) or isinstance(values['units'], bool) or values['units'] < 1:
+            errors.append('units must be a positive integer')
+        if values['status'] not in DONATION_STATUS.values():
+            errors.append(f'status must be one of: {", ".join(DONATION_STATUS.values())}')
+
+        try:
+            donation_date = datetime.fromisoformat(item['donation_date'])
+            if donation_date.tzinfo is not None:
+                donation_date = donation_date.astimezone(timezone.utc).replace(tzinfo=None)
+            values['donation_date'] = donation_date
+        except KeyError:
+            errors.append('donation_date is required')
+        except (TypeError, ValueError):
+            errors.append('donation_date must be an ISO 8601 date')
+
+        return values, errors
+
+    def record_donations(self, hospital_id, items):
+        """Record a batch of donations at a hospital, all or nothing.
+
+        Donors are checked with one IN query (a record's blood_type defaults
+        to its donor's and must match it) and request ids must belong to the
+        hospital. The donations are inserted in bulk, then a single UPDATE
+        moves every donor with a completed donation to its latest donation
+        date and makes it unavailable. The caller commits.
+        Returns (donation ids in record order, errors); errors lists
+        {'index', 'errors'} per invalid record and nothing is written then.
+        """
+        parsed = [self._parse(item) for item in items]
+        donor_ids = {values['donor_id'] for values, errors in parsed if not errors}
+        request_ids = {values['request_id'] for values, errors in parsed if not errors} - {None}
+
+        donor_blood_types = dict(db.session.execute(
+            select(_donors.c.id, _donors.c.blood_type).where(_donors.c.id.in_(donor_ids))
+        ).all()) if donor_ids else {}
+        hospital_requests = set(db.session.scalars(
+            select(BloodRequest.id).where(
+                BloodRequest.id.in_(request_ids),
+                BloodRequest.hospital_id == hospital_id
+            )
+        )) if request_ids else set()
+
+        rows, report = [], []
+        for index, (values, errors) in enumerate(parsed):
+            if not errors:
+                blood_type = donor_blood_types.get(values['donor_id'])
+                if blood_type is None:
+                    errors.append('Donor not found')
+                elif values['blood_type'] is None:
+                    values['blood_type'] = blood_type
+                elif values['blood_type'] != blood_type:
+                    errors.append("blood_type does not match the donor's")
+                if values['request_id'] is not None and values['request_id'] not in hospital_requests:
+                    errors.append('Request not found')
+            if errors:
+                report.append({'index': index, 'errors': errors})
+            else:
+                rows.append(dict(values, hospital_id=hospital_id))
+        if report:
+            return [], report
+
+        # RETURNING does not promise record order, and sort_by_parameter_order
+        # would make SQLite insert row by row: return the inserted values with
+        # each id and match them back to the records. Records equal in every
+        # column are interchangeable, so any pairing among them is right.
+        # A table insert, as the ORM splits the batch wherever NULLs change.
+        keys = list(rows[0])
+        inserted = db.session.execute(
+            insert(_donations).returning(_donations.c.id, *(_donations.c[key] for key in keys)),
+            rows
+        ).all()
+        ids_by_values = {}
+        for donation_id, *values in sorted(inserted):
+            ids_by_values.setdefault(tuple(values), []).append(donation_id)
+        donation_ids = [ids_by_values[tuple(row[key] for key in keys)].pop(0) for row in rows]
+
+        donated = {row['donor_id'] for row in rows if row['status'] == DONATION_STATUS['COMPLETED']}
+        if donated:
+            latest_donation = select(func.max(Donation.donation_date))\
+                .where(Donation.donor_id == _donors.c.id, Donation.status == DONATION_STATUS['COMPLETED'])\
+                .scalar_subquery()
+            donors = db.session.execute(
+                update(_donors)
+                .where(_donors.c.id.in_(donated))
+                .values(last_donation_date=latest_donation, is_available=False)
+                .returning(*_donors.c)
+            ).mappings().all()
+            # A set-based UPDATE bypasses the mapper events feeding the snapshot
+            donor_snapshot.stage_donors(db.session, donors)
+
+        return donation_ids, []
+
+    def _filter(self, query, blood_type=None, status=None):
+        if blood_type:
+            query = query.filter(Donation.blood_type == blood_type)
+        if status:
+            query = query.filter(Donation.status == status)
+        return query
+
+    def hospital_history_query(self, hospital_id, blood_type=None, status=None):
+        """Query a hospital's donations, newest first, with donor and hospital names.
+
+        Rows carry exactly the fields of Donation.to_dict (see row_to_dict),
+        projected in one statement instead of two lazy loads per donation.
+        """
+        query = db.session.query(
+            Donation.id,
+            Donation.donor_id,
+            _donors.c.name.label('donor_name'),
+            Donation.hospital_id,
+            _hospitals.c.name.label('hospital_name'),
+            Donation.request_id,
+            Donation.blood_type,
+            Donation.units,
+            Donation.donation_date,
+            Donation.status,
+            Donation.notes,
+            Donation.created_at,
+            Donation.updated_at
+        ).join(_donors, _donors.c.id == Donation.donor_id)\
+            .join(_hospitals, _hospitals.c.id == Donation.hospital_id)\
+            .filter(Donation.hospital_id == hospital_id)\
+            .order_by(Donation.donation_date.desc(), Donation.id.desc())
+        return self._filter(query, blood_type, status)
+
+    def donor_history_query(self, donor_id, blood_type=None, status=None):
+        """Query a donor's donations, newest first, with the hospital name."""
+        query = db.session.query(
+            Donation.id,
+            Donation.blood_type,
+            Donation.units,
+            Donation.donation_date,
+            _hospitals.c.name.label('hospital_name'),
+            Donation.notes
+        ).join(_hospitals, _hospitals.c.id == Donation.hospital_id)\
+            .filter(Donation.donor_id == donor_id)\
+            .order_by(Donation.donation_date.desc(), Donation.id.desc())
+        return self._filter(query, blood_type, status)
+
+    def fulfilled_requests_query(self, hospital_id):
+        """Query a hospital's fulfilled requests with the name of the donor of their first donation."""
+        first_donor_name = select(_donors.c.name)\
+            .join(Donation, Donation.donor_id == _donors.c.id)\
+            .where(Donation.request_id == BloodRequest.id)\
+            .order_by(Donation.id)\
+            .limit(1)\
+            .correlate(BloodRequest)\
+            .scalar_subquery()
+
+        return db.session.query(
+            BloodRequest.id,
+            BloodRequest.blood_type,
+            BloodRequest.units_needed,
+            BloodRequest.urgency_level,
+            BloodRequest.updated_at,
+            BloodRequest.description,
+            first_donor_name.label('donor_name')
+        ).filter(
+            BloodRequest.hospital_id == hospital_id,
+            BloodRequest.status == 'fulfilled'
+        ).order_by(BloodRequest.updated_at.desc())
+
+    def row_to_dict(self, row):
+        """Serialize a hospital_history_query row like Donation.to_dict."""
+        return {
+            'id': row.id,
+            'donor_id': row.donor_id,
+            'donor_name': row.donor_name,
+            'hospital_id': row.hospital_id,
+            'hospital_name': row.hospital_name,
+            'request_id': row.request_id,
+            'blood_type': row.blood_type,
+            'units': row.units,
+            'donation_date': row.donation_date.isoformat(),
+            'status': row.status,
+            'notes': row.notes,
+            'created_at': row.created_at.isoformat(),
+            'updated_at': row.updated_at.isoformat()
+        }
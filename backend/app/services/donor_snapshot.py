@@ -0,0 +1,380 @@
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+from math import floor
+import threading
+import time
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import event, select
+
+from app import db, socketio
+from app.models.donation import Donation
+from app.models.donor import Donor
+from app.services.commit_hooks import on_commit, stage, stage_many
+from app.utils.blood_types import BLOOD_TYPE_CODES, blood_type_mask, codes_in_mask, get_blood_type_code
+from app.utils.constants import DONATION_COOLDOWN
+from app.utils.geolocation import bounding_box, longitude_ranges
+
+DonorColumns = namedtuple('DonorColumns', ['ids', 'codes', 'latitudes', 'longitudes', 'eligible_from'])
+
+_NOT_A_TIME = np.datetime64('NaT', 'us')
+
+def _eligible_from(last_donation_date):
+    """Date a donor may give again, NaT for donors who never donated."""
+    if last_donation_date is None:
+        return _NOT_A_TIME
+    return np.datetime64(last_donation_date + timedelta(days=DONATION_COOLDOWN), 'us')
+
+class DonorSnapshot:
+    """Process-local, columnar copy of the matchable donor state.
+
+    Holds one row per donor (id, blood type code, latitude, longitude,
+    availability and the date the donor becomes eligible again) in NumPy
+    arrays, so radius and compatibility filters run as vector operations
+    instead of database queries.
+
+    Located donors are also bucketed by blood type code and grid cell of
+    ``cell_size`` degrees, so a radius search only scans the rows of the
+    cells overlapping its bounding box instead of every donor.
+
+    The snapshot is patched from committed Donor writes; committed Donation
+    writes mark their donor dirty and it is re-read on the next lookup.
+    Writes made by other worker processes are not seen, so the snapshot is
+    rebuilt in the background once it is older than ``max_age`` seconds,
+    lookups reading the previous copy meanwhile; ``rebuild()`` rebuilds
+    immediately.
+    """
+
+    _STATE = ('_size', '_rows', '_buckets', '_bucket_of', '_ids', '_codes',
+              '_latitudes', '_longitudes', '_available', '_eligible_from')
+
+    def __init__(self, max_age=300, initial_capacity=1024, cell_size=0.25):
+        self.max_age = max_age
+        self.cell_size = cell_size
+        self.lon_cells = int(round(360 / cell_size))
+        self.version = 0
+        self.built_at = None
+        self._initial_capacity = initial_capacity
+        self._lock = threading.RLock()
+        self._dirty = set()
+        self._rebuilding = False
+        self._missed = None  # changes applied while a rebuild was reading
+        self._reset(initial_capacity)
+
+    def _reset(self, capacity):
+        self._size = 0
+        self._rows = {}  # donor id -> row number
+        self._buckets = defaultdict(set)  # (blood type code, cell) -> donor ids
+        self._bucket_of = {}  # donor id -> its bucket
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._codes = np.zeros(capacity, dtype=np.uint8)
+        self._latitudes = np.full(capacity, np.nan)
+        self._longitudes = np.full(capacity, np.nan)
+        self._available = np.zeros(capacity, dtype=bool)
+        self._eligible_from = np.full(capacity, _NOT_A_TIME)
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def is_built(self):
+        return self.built_at is not None
+
+    @property
+    def age(self):
+        """Seconds since the last full build (None if never built)."""
+        if self.built_at is None:
+            return None
+        return time.monotonic() - self.built_at
+
+    @property
+    def is_stale(self):
+        return self.built_at is None or self.age > self.max_age
+
+    def _grow(self):
+        capacity = max(len(self._ids) * 2, self._initial_capacity)
+        for name in ('_ids', '_codes', '_latitudes', '_longitudes', '_available', '_eligible_from'):
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+
+    def _cell(self, latitude, longitude):
+        lat_cell = floor((latitude + 90) / self.cell_size)
+        lon_cell = floor((longitude + 180) / self.cell_size) % self.lon_cells
+        return lat_cell, lon_cell
+
+    def _unbucket(self, donor_id):
+        bucket = self._bucket_of.pop(donor_id, None)
+        if bucket is not None:
+            donors = self._buckets[bucket]
+            donors.discard(donor_id)
+            if not donors:
+                del self._buckets[bucket]
+
+    def _bucket(self, donor_id, code, latitude, longitude):
+        self._unbucket(donor_id)
+        if latitude is None or longitude is None:
+            return
+        bucket = (code, self._cell(latitude, longitude))
+        self._buckets[bucket].add(donor_id)
+        self._bucket_of[donor_id] = bucket
+
+    def _set(self, row, donor_id, blood_type, latitude, longitude, is_available, last_donation_date):
+        self._ids[row] = donor_id
+        self._codes[row] = get_blood_type_code(blood_type)
+        self._latitudes[row] = np.nan if latitude is None else latitude
+        self._longitudes[row] = np.nan if longitude is None else longitude
+        self._available[row] = bool(is_available)
+        self._eligible_from[row] = _eligible_from(last_donation_date)
+        self._bucket(donor_id, int(self._codes[row]), latitude, longitude)
+
+    def _upsert(self, donor_id, *state):
+        row = self._rows.get(donor_id)
+        if row is None:
+            if self._size == len(self._ids):
+                self._grow()
+            row = self._size
+            self._size += 1
+            self._rows[donor_id] = row
+        self._set(row, donor_id, *state)
+
+    def _delete(self, donor_id):
+        # Move the last row into the freed slot to keep the columns dense
+        row = self._rows.pop(donor_id, None)
+        if row is None:
+            return
+        self._unbucket(donor_id)
+        last = self._size - 1
+        if row != last:
+            for column in (self._ids, self._codes, self._latitudes, self._longitudes,
+                           self._available, self._eligible_from):
+                column[row] = column[last]
+            self._rows[int(self._ids[row])] = row
+        self._size = last
+
+    @staticmethod
+    def _query(donor_ids=None):
+        donors = Donor.__table__
+        query = select(
+            donors.c.id,
+            donors.c.blood_type,
+            donors.c.latitude,
+            donors.c.longitude,
+            donors.c.is_available,
+            donors.c.last_donation_date
+        )
+        if donor_ids is not None:
+            query = query.where(donors.c.id.in_(donor_ids))
+        return db.session.execute(query)
+
+    def rebuild(self):
+        """Reload every donor from the database.
+
+        The new copy is built aside and swapped in, so lookups keep reading
+        the old one meanwhile; changes committed during the build are
+        replayed onto the new copy.
+        """
+        with self._lock:
+            self._missed = {}
+            covered = set(self._dirty)  # donors the full read below picks up
+        try:
+            rows = self._query().all()
+            fresh = DonorSnapshot(self.max_age, self._initial_capacity, self.cell_size)
+            fresh._reset(max(len(rows), self._initial_capacity))
+            for row in rows:
+                fresh._upsert(*row)
+
+            with self._lock:
+                for name in self._STATE:
+                    setattr(self, name, getattr(fresh, name))
+                missed, self._missed = self._missed, None
+                for donor_id, state in missed.items():
+                    if state is None:
+                        self._delete(donor_id)
+                    else:
+                        self._upsert(donor_id, *state)
+                self._dirty -= covered
+                self.built_at = time.monotonic()
+                self.version += 1
+        finally:
+            with self._lock:
+                self._missed = None
+
+    def _rebuild_in_background(self, app):
+        try:
+            with app.app_context():
+                self.rebuild()
+        finally:
+            self._rebuilding = False
+
+    def refresh_in_background(self):
+        """Start a rebuild in a background task unless one is already running."""
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        socketio.start_background_task(self._rebuild_in_background, current_app._get_current_object())
+
+    def apply(self, changes):
+        """Apply committed {donor_id: state or None} changes."""
+        with self._lock:
+            if not self.is_built:
+                return
+            if self._missed is not None:
+                self._missed.update(changes)
+            for donor_id, state in changes.items():
+                if state is None:
+                    self._delete(donor_id)
+                else:
+                    self._upsert(donor_id, *state)
+                self._dirty.discard(donor_id)
+            self.version += 1
+
+    def mark_dirty(self, donor_ids):
+        """Re-read these donors from the database on the next lookup."""
+        with self._lock:
+            self._dirty.update(donor_ids)
+
+    def _refresh_dirty(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        if not dirty:
+            return
+        dirty = list(dirty)
+        changes = dict.fromkeys(dirty)  # donors gone from the table are deleted
+        for start in range(0, len(dirty), 500):
+            for row in self._query(dirty[start:start + 500]):
+                changes[row[0]] = tuple(row[1:])
+        self.apply(changes)
+
+    def ensure_fresh(self):
+        """Pick up dirty donors before a lookup, starting a background rebuild when stale.
+
+        Only a snapshot that was never built is built inline; a stale one
+        keeps serving lookups until its replacement is swapped in, so no
+        request waits for a full rebuild.
+        """
+        if not self.is_built:
+            self.rebuild()
+            return
+        if self.is_stale:
+            self.refresh_in_background()
+        self._refresh_dirty()
+
+    def _candidate_rows(self, codes, min_lat, max_lat, lon_ranges):
+        """Row numbers of the donors bucketed in the cells overlapping the box.
+
+        Returns None when the box spans more cells than there are buckets,
+        where scanning every row is cheaper than walking the cells.
+        """
+        lat_cells = range(
+            floor((max(min_lat, -90) + 90) / self.cell_size),
+            floor((min(max_lat, 90) + 90) / self.cell_size) + 1
+        )
+        lon_cells = set()
+        for low, high in lon_ranges:
+            first = floor((low + 180) / self.cell_size)
+            last = floor((high + 180) / self.cell_size)
+            if last - first + 1 >= self.lon_cells:
+                lon_cells = set(range(self.lon_cells))
+                break
+            lon_cells.update(cell % self.lon_cells for cell in range(first, last + 1))
+
+        if len(codes) * len(lat_cells) * len(lon_cells) > len(self._buckets):
+            return None
+
+        rows = []
+        for code in codes:
+            for lat_cell in lat_cells:
+                for lon_cell in lon_cells:
+                    donors = self._buckets.get((code, (lat_cell, lon_cell)))
+                    if donors:
+                        rows.extend(self._rows[donor_id] for donor_id in donors)
+        return np.array(rows, dtype=np.int64)
+
+    def select(self, blood_types, latitude, longitude, radius, available_only=True):
+        """Get the columns of donors of the given blood types inside the radius' bounding box.
+
+        Rows come back as a DonorColumns of arrays ordered by donor id; exact
+        distances still have to be checked by the caller.
+        """
+        self.ensure_fresh()
+        min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius)
+        lon_ranges = longitude_ranges(min_lon, max_lon)
+        mask_of_types = blood_type_mask(blood_types)
+        codes = sorted({BLOOD_TYPE_CODES[t] for t in blood_types if t in BLOOD_TYPE_CODES})
+
+        with self._lock:
+            rows = self._candidate_rows(codes, min_lat, max_lat, lon_ranges)
+            if rows is None:
+                rows = np.flatnonzero(codes_in_mask(self._codes[:self._size], mask_of_types))
+
+            latitudes = self._latitudes[rows]
+            longitudes = self._longitudes[rows]
+            mask = (latitudes >= min_lat) & (latitudes <= max_lat)
+            if available_only:
+                mask &= self._available[rows]
+
+            in_lon = np.zeros(len(rows), dtype=bool)
+            for low, high in lon_ranges:
+                in_lon |= (longitudes >= low) & (longitudes <= high)
+            mask &= in_lon
+
+            rows = rows[mask]
+            rows = rows[np.argsort(self._ids[rows], kind='stable')]
+            return DonorColumns(
+                ids=self._ids[rows],
+                codes=self._codes[rows],
+                latitudes=self._latitudes[rows],
+                longitudes=self._longitudes[rows],
+                eligible_from=self._eligible_from[rows]
+            )
+
+donor_snapshot = DonorSnapshot()
+
+# Patch the snapshot from committed writes
+_CHANGES_KEY = 'donor_snapshot_changes'
+_DIRTY_KEY = 'donor_snapshot_dirty'
+
+@event.listens_for(Donor, 'after_insert')
+@event.listens_for(Donor, 'after_update')
+def _donor_saved(mapper, connection, target):
+    stage(target, _CHANGES_KEY, target.id, (
+        target.blood_type,
+        target.latitude,
+        target.longitude,
+        target.is_available,
+        target.last_donation_date
+    ))
+
+@event.listens_for(Donor, 'after_delete')
+def _donor_deleted(mapper, connection, target):
+    stage(target, _CHANGES_KEY, target.id, None)
+
+@event.listens_for(Donation, 'after_insert')
+@event.listens_for(Donation, 'after_update')
+def _donation_saved(mapper, connection, target):
+    stage(target, _DIRTY_KEY, target.donor_id, True)
+
+def stage_donors(session, donors):
+    """Stage donor rows written without the ORM, which mapper events never see.
+
+    donors are mappings of donors table columns; they reach the snapshot
+    once the session commits.
+    """
+    stage_many(session, _CHANGES_KEY, {
+        donor['id']: (
+            donor['blood_type'],
+            donor['latitude'],
+            donor['longitude'],
+            donor['is_available'],
+            donor['last_donation_date']
+        )
+        for donor in donors
+    })
+
+on_commit(_CHANGES_KEY, donor_snapshot.apply)
+on_commit(_DIRTY_KEY, lambda changes: donor_snapshot.mark_dirty(changes.keys()))
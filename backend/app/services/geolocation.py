@@ -1,89 +1,112 @@
-from math import radians, sin, cos, sqrt, atan2
 from app import db
 from app.models.donor import Donor
 from app.models.hospital import Hospital
-from sqlalchemy import text
+from app.services.donor_snapshot import donor_snapshot
+from app.services.spatial_rtree import donor_rtree, hospital_rtree, within_bounding_box
+from app.utils.blood_types import BLOOD_TYPES, get_all_blood_types
+from app.utils.geolocation import EARTH_RADIUS, calculate_distance, calculate_distances
+from sqlalchemy import select
+import numpy as np
 
 class GeolocationService:
     def __init__(self):
-        self.EARTH_RADIUS = 6371  # Earth's radius in kilometers
+        self.EARTH_RADIUS = EARTH_RADIUS  # Earth's radius in kilometers
 
     def calculate_distance(self, lat1, lon1, lat2, lon2):
         """Calculate distance between two points using Haversine formula."""
-        lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-        
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1-a))
-        
-        return self.EARTH_RADIUS * c
+        return calculate_distance(lat1, lon1, lat2, lon2)
+
+    def calculate_distances(self, latitude, longitude, latitudes, longitudes):
+        """Calculate distances from one point to many points in one vectorized pass."""
+        return calculate_distances(latitude, longitude, latitudes, longitudes)
+
+    def _refine(self, rows, latitude, longitude, radius):
+        """Keep rows strictly within radius, paired with their distance, nearest first."""
+        distances = calculate_distances(
+            latitude,
+            longitude,
+            [row.latitude for row in rows],
+            [row.longitude for row in rows]
+        ).tolist()
+
+        nearby = [(row, distance) for row, distance in zip(rows, distances) if distance < radius]
+        return sorted(nearby, key=lambda x: x[1])
 
     def find_nearby_donors(self, latitude, longitude, radius=10, blood_type=None):
         """Find donors within a specified radius."""
-        # Using SQL for more efficient geospatial query
-        query = text("""
-            SELECT id, name, blood_type, latitude, longitude,
-                   (6371 * acos(cos(radians(:lat)) * cos(radians(latitude)) *
-                    cos(radians(longitude) - radians(:lon)) +
-                    sin(radians(:lat)) * sin(radians(latitude)))) AS distance
-            FROM donors
-            WHERE is_available = TRUE
-            HAVING distance < :radius
-            ORDER BY distance
-        """)
-        
-        result = db.session.execute(
-            query,
-            {
-                'lat': latitude,
-                'lon': longitude,
-                'radius': radius
-            }
-        )
-        
-        donors = []
-        for row in result:
-            if blood_type and row.blood_type != blood_type:
-                continue
-            donors.append({
-                'id': row.id,
-                'name': row.name,
-                'blood_type': row.blood_type,
-                'distance': round(row.distance, 1)
-            })
-        
-        return donors
+        blood_types = [blood_type] if blood_type else get_all_blood_types()
+
+        if donor_snapshot.is_built:
+            return self._find_nearby_donors_in_snapshot(latitude, longitude, radius, blood_types)
+
+        # The bounding box is resolved by the R*Tree when installed, otherwise
+        # by the composite (is_available, blood_type, latitude, longitude)
+        # index; exact distances are only computed for the survivors.
+        rows = db.session.query(
+            Donor.id,
+            Donor.name,
+            Donor.blood_type,
+            Donor.latitude,
+            Donor.longitude
+        ).filter(
+            Donor.is_available == True,
+            Donor.blood_type.in_(blood_types),
+            within_bounding_box(Donor, donor_rtree, latitude, longitude, radius)
+        ).all()
+
+        return [{
+            'id': row.id,
+            'name': row.name,
+            'blood_type': row.blood_type,
+            'distance': round(distance, 1)
+        } for row, distance in self._refine(rows, latitude, longitude, radius)]
+
+    def _find_nearby_donors_in_snapshot(self, latitude, longitude, radius, blood_types):
+        """Radius search against the in-memory donor snapshot; only names come from the database."""
+        columns = donor_snapshot.select(blood_types, latitude, longitude, radius)
+        distances = calculate_distances(latitude, longitude, columns.latitudes, columns.longitudes)
+
+        within = distances < radius
+        order = np.argsort(distances[within], kind='stable')
+        donor_ids = columns.ids[within][order].tolist()
+        codes = columns.codes[within][order].tolist()
+        distances = distances[within][order].tolist()
+
+        donors = Donor.__table__
+        names = {}
+        for start in range(0, len(donor_ids), 500):
+            names.update(db.session.execute(
+                select(donors.c.id, donors.c.name).where(
+                    donors.c.id.in_(donor_ids[start:start + 500])
+                )
+            ).all())
+
+        return [{
+            'id': donor_id,
+            'name': names.get(donor_id),
+            'blood_type': BLOOD_TYPES[code],
+            'distance': round(distance, 1)
+        } for donor_id, code, distance in zip(donor_ids, codes, distances)]
 
     def find_nearby_hospitals(self, latitude, longitude, radius=10):
         """Find hospitals within a specified radius."""
-        query = text("""
-            SELECT id, name, address, latitude, longitude,
-                   (6371 * acos(cos(radians(:lat)) * cos(radians(latitude)) *
-                    cos(radians(longitude) - radians(:lon)) +
-                    sin(radians(:lat)) * sin(radians(latitude)))) AS distance
-            FROM hospitals
-            WHERE is_verified = TRUE
-            HAVING distance < :radius
-            ORDER BY distance
-        """)
-        
-        result = db.session.execute(
-            query,
-            {
-                'lat': latitude,
-                'lon': longitude,
-                'radius': radius
-            }
-        )
-        
+        rows = db.session.query(
+            Hospital.id,
+            Hospital.name,
+            Hospital.address,
+            Hospital.latitude,
+            Hospital.longitude
+        ).filter(
+            Hospital.is_verified == True,
+            within_bounding_box(Hospital, hospital_rtree, latitude, longitude, radius)
+        ).all()
+
         return [{
             'id': row.id,
             'name': row.name,
             'address': row.address,
-            'distance': round(row.distance, 1)
-        } for row in result]
+            'distance': round(distance, 1)
+        } for row, distance in self._refine(rows, latitude, longitude, radius)]
 
     def update_location(self, user, latitude, longitude):
         """Update user's location."""
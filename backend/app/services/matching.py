@@ -1,10 +1,21 @@
 from app import db
 from app.models.donor import Donor
 from app.models.request import BloodRequest
-from app.utils.blood_types import get_compatible_donors
-from app.utils.geolocation import calculate_distance
-from sqlalchemy import and_
+from app.utils.blood_types import compatible_donor_mask, encode_blood_types, get_compatible_donors
+from app.utils.constants import DONATION_COOLDOWN
+from app.utils.cursors import decode_cursor, encode_cursor
+from app.utils.geolocation import calculate_distances, distance_matrix
+from app.utils.ranking import top_k
+from app.services.donor_snapshot import donor_snapshot
+from app.services.spatial_rtree import donor_rtree, within_bounding_box
+from sqlalchemy import and_, select
+from collections import defaultdict, namedtuple
 from datetime import datetime
+from operator import itemgetter
+import time
+import numpy as np
+
+CandidateBatch = namedtuple('CandidateBatch', ['ids', 'codes', 'latitudes', 'longitudes', 'eligible'])
 
 class MatchingService:
     def __init__(self):
@@ -15,35 +26,243 @@ class MatchingService:
             'normal': 1.0
         }
 
-    def find_matching_donors(self, blood_request):
-        """Find compatible donors for a blood request."""
+        # Emergency matching: search radii (km) widened in order, minimum
+        # score to qualify, donors wanted per unit and time budget (seconds)
+        self.EMERGENCY_RINGS = (10, 25, 50, 75, 100)
+        self.EMERGENCY_MIN_SCORE = 0.7
+        self.EMERGENCY_DONORS_PER_UNIT = 3
+        self.EMERGENCY_TIME_BUDGET = 0.5
+
+    def find_matching_donors(self, blood_request, limit=None, cursor=None):
+        """Find compatible donors for a blood request.
+
+        Matches are ranked by score (highest first, ties by donor id). With a
+        limit only the best `limit` matches ranked after `cursor` are returned.
+        """
+        candidates = self._score_donors(blood_request, self.MAX_DISTANCE)
+        ranked = top_k(
+            candidates,
+            key=itemgetter(0, 1),
+            limit=limit,
+            after=self._decode_rank_cursor(cursor)
+        )
+        return self._hydrate_donor_matches(ranked)
+
+    def match_many(self, blood_requests, limit=None):
+        """Find compatible donors for many blood requests in one vectorized pass.
+
+        Candidate donors are gathered once per distinct hospital location and
+        scored against every location through a single locations x donors
+        distance matrix. Requests sharing location, blood type and urgency
+        share one ranking. Returns {request_id: matches}, each list shaped
+        and ordered like find_matching_donors.
+        """
+        results = {blood_request.id: [] for blood_request in blood_requests}
+
+        # Group requests by hospital location, then blood type and urgency
+        locations = {}
+        location_blood_types = defaultdict(set)
+        groups = defaultdict(list)
+        for blood_request in blood_requests:
+            hospital = blood_request.hospital
+            if hospital.latitude is None or hospital.longitude is None:
+                continue
+            index = locations.setdefault((hospital.latitude, hospital.longitude), len(locations))
+            location_blood_types[index].update(get_compatible_donors(blood_request.blood_type))
+            groups[(index, blood_request.blood_type, blood_request.urgency_level)].append(blood_request.id)
+
+        batches = [
+            batch
+            for (latitude, longitude), index in locations.items()
+            for batch in self._candidate_donor_batches(
+                sorted(location_blood_types[index]),
+                latitude,
+                longitude,
+                self.MAX_DISTANCE
+            )
+        ]
+        if not batches:
+            return results
+
+        # Merge the per-location candidates, keeping each donor once (in id order)
+        donor_ids, first = np.unique(np.concatenate([batch.ids for batch in batches]), return_index=True)
+        codes = np.concatenate([batch.codes for batch in batches])[first]
+        latitudes = np.concatenate([batch.latitudes for batch in batches])[first]
+        longitudes = np.concatenate([batch.longitudes for batch in batches])[first]
+        eligible = np.concatenate([batch.eligible for batch in batches])[first]
+
+        distances = distance_matrix(
+            [latitude for latitude, _ in locations],
+            [longitude for _, longitude in locations],
+            latitudes,
+            longitudes
+        )
+
+        compatible = {}
+        ranked = {}
+        for (index, blood_type, urgency_level), request_ids in groups.items():
+            if blood_type not in compatible:
+                compatible[blood_type] = compatible_donor_mask(codes, blood_type)
+
+            row = distances[index]
+            keep = compatible[blood_type] & (row <= self.MAX_DISTANCE)
+            scores = self._calculate_match_scores(row[keep], urgency_level, eligible[keep])
+            candidates = self._rank_arrays(scores, donor_ids[keep], row[keep], limit)
+            for request_id in request_ids:
+                ranked[request_id] = candidates
+
+        donors = self._load_donors_by_id({
+            donor_id for candidates in ranked.values() for _, donor_id, _ in candidates
+        })
+        for request_id, candidates in ranked.items():
+            results[request_id] = self._hydrate_donor_matches(candidates, donors)
+        return results
+
+    @staticmethod
+    def _rank_arrays(scores, donor_ids, distances, limit=None):
+        """Order scored candidate arrays by (-score, donor_id), keeping the first `limit`,
+        as (-score, donor_id, distance) tuples."""
+        if limit is not None and len(scores) > limit:
+            # Cheap partial selection first; ties at the cut-off are all kept
+            threshold = np.partition(scores, len(scores) - limit)[len(scores) - limit]
+            keep = scores >= threshold
+            scores, donor_ids, distances = scores[keep], donor_ids[keep], distances[keep]
+
+        order = np.lexsort((donor_ids, -scores))[:limit]
+        return list(zip(
+            (-scores[order]).tolist(),
+            donor_ids[order].tolist(),
+            distances[order].tolist()
+        ))
+
+    def _score_donors(self, blood_request, max_distance):
+        """Yield (-score, donor_id, distance) for every compatible donor within max_distance.
+
+        Scoring only reads projected donor columns; Donor entities are loaded
+        afterwards for the ranked matches that are actually returned.
+        """
+        hospital = blood_request.hospital
         compatible_blood_types = get_compatible_donors(blood_request.blood_type)
-        
-        donors = Donor.query.filter(
-            and_(
-                Donor.is_available == True,
-                Donor.blood_type.in_(compatible_blood_types)
+
+        for batch in self._candidate_donor_batches(
+            compatible_blood_types,
+            hospital.latitude,
+            hospital.longitude,
+            max_distance
+        ):
+            distances = calculate_distances(
+                hospital.latitude,
+                hospital.longitude,
+                batch.latitudes,
+                batch.longitudes
             )
-        ).all()
-
-        matched_donors = []
-        for donor in donors:
-            distance = calculate_distance(
-                blood_request.hospital.latitude,
-                blood_request.hospital.longitude,
-                donor.latitude,
-                donor.longitude
+            within = distances <= max_distance
+            if not within.any():
+                continue
+
+            scores = self._calculate_match_scores(distances, blood_request.urgency_level, batch.eligible)
+            yield from zip(
+                (-scores[within]).tolist(),
+                batch.ids[within].tolist(),
+                distances[within].tolist()
             )
-            
-            if distance <= self.MAX_DISTANCE:
-                score = self._calculate_match_score(donor, blood_request, distance)
-                matched_donors.append({
-                    'donor': donor,
-                    'distance': distance,
-                    'score': score
-                })
 
-        return sorted(matched_donors, key=lambda x: x['score'], reverse=True)
+    def _candidate_donor_batches(self, blood_types, latitude, longitude, radius, batch_size=500):
+        """Yield CandidateBatch arrays for available donors of the given blood
+        types that may lie within radius km.
+
+        `eligible` flags donors past the donation cooldown. Only the donors
+        table is read (no join to user), and rows come out in id order so
+        rankings break ties deterministically.
+        """
+        if latitude is None or longitude is None:
+            return
+
+        now = datetime.utcnow()
+
+        # The in-memory donor snapshot is the candidate source whenever it is
+        # loaded; the donors table is only read when it is disabled
+        if donor_snapshot.is_built:
+            columns = donor_snapshot.select(blood_types, latitude, longitude, radius)
+            eligible = np.isnat(columns.eligible_from) | (columns.eligible_from <= np.datetime64(now, 'us'))
+            yield CandidateBatch(columns.ids, columns.codes, columns.latitudes, columns.longitudes, eligible)
+            return
+
+        donors = Donor.__table__
+        query = select(
+            donors.c.id,
+            donors.c.blood_type,
+            donors.c.latitude,
+            donors.c.longitude,
+            donors.c.last_donation_date
+        ).where(
+            donors.c.is_available == True,
+            donors.c.blood_type.in_(blood_types),
+            within_bounding_box(donors.c, donor_rtree, latitude, longitude, radius)
+        ).order_by(donors.c.id).execution_options(yield_per=batch_size)
+        for rows in db.session.execute(query).partitions():
+            yield self._columns_from_rows(rows, now)
+
+    @staticmethod
+    def _columns_from_rows(rows, now):
+        """Turn (id, blood_type, latitude, longitude, last_donation_date) rows into a CandidateBatch."""
+        count = len(rows)
+        donor_ids = np.fromiter((row.id for row in rows), dtype=np.int64, count=count)
+        codes = encode_blood_types([row.blood_type for row in rows])
+        latitudes = np.array([row.latitude for row in rows], dtype=np.float64)
+        longitudes = np.array([row.longitude for row in rows], dtype=np.float64)
+        eligible = np.fromiter(
+            (row.last_donation_date is None
+             or (now - row.last_donation_date).days >= DONATION_COOLDOWN for row in rows),
+            dtype=bool,
+            count=count
+        )
+        return CandidateBatch(donor_ids, codes, latitudes, longitudes, eligible)
+
+    def _load_donors_by_id(self, donor_ids, chunk_size=500):
+        """Load Donor entities for donor_ids into an {id: donor} dict."""
+        donor_ids = list(donor_ids)
+        donors = {}
+        for start in range(0, len(donor_ids), chunk_size):
+            for donor in Donor.query.filter(Donor.id.in_(donor_ids[start:start + chunk_size])):
+                donors[donor.id] = donor
+        return donors
+
+    def _hydrate_donor_matches(self, ranked, donors=None):
+        """Turn ranked (-score, donor_id, distance) candidates into match dicts, keeping rank order."""
+        if donors is None:
+            donors = self._load_donors_by_id(donor_id for _, donor_id, _ in ranked)
+
+        return [{
+            'donor': donors[donor_id],
+            'distance': distance,
+            'score': -neg_score
+        } for neg_score, donor_id, distance in ranked if donor_id in donors]
+
+    @staticmethod
+    def _donor_rank_key(match):
+        return (-match['score'], match['donor'].id)
+
+    @staticmethod
+    def _request_rank_key(match):
+        return (-match['score'], match['request'].id)
+
+    def _decode_rank_cursor(self, cursor):
+        """Turn a cursor token into the rank key to continue after (ValueError if invalid)."""
+        if not cursor:
+            return None
+        key = decode_cursor(cursor)
+        if len(key) != 2 or not all(isinstance(value, (int, float)) for value in key):
+            raise ValueError('Invalid cursor')
+        return tuple(key)
+
+    def donor_match_cursor(self, match):
+        """Get the cursor token continuing a donor ranking after match."""
+        return encode_cursor(self._donor_rank_key(match))
+
+    def request_match_cursor(self, match):
+        """Get the cursor token continuing a request ranking after match."""
+        return encode_cursor(self._request_rank_key(match))
 
     def _calculate_match_score(self, donor, request, distance):
         """Calculate match score between donor and request."""
@@ -67,8 +286,18 @@ class MatchingService:
             
         return score
 
-    def find_matching_requests(self, donor, max_distance=None):
-        """Find compatible blood requests for a donor, sorted by matching score."""
+    def _calculate_match_scores(self, distances, urgency_level, eligible):
+        """Vectorized _calculate_match_score over arrays of distances and
+        donation-eligibility flags for a single request."""
+        scores = (1 - (distances / self.MAX_DISTANCE)) * 0.4
+        scores = scores + self.URGENCY_WEIGHTS.get(urgency_level, 1.0) * 0.3
+        return scores + np.where(eligible, 0.3, 0.0)
+
+    def find_matching_requests(self, donor, max_distance=None, limit=None, cursor=None):
+        """Find compatible blood requests for a donor, sorted by matching score.
+
+        With a limit only the best `limit` requests ranked after `cursor` are returned.
+        """
         max_distance = max_distance or self.MAX_DISTANCE
         
         # Get basic compatible requests query
@@ -77,45 +306,87 @@ class MatchingService:
                 BloodRequest.status == 'open',
                 BloodRequest.blood_type == donor.blood_type
             )
-        ).all()
+        ).order_by(BloodRequest.id).all()
         
         # Calculate scores and filter by distance
-        scored_requests = []
-        for request in compatible_requests:
-            distance = calculate_distance(
-                donor.latitude,
-                donor.longitude,
-                request.hospital.latitude,
-                request.hospital.longitude
-            )
-            
-            # Skip if request is too far
-            if distance > max_distance:
-                continue
-            
-            # Calculate matching score
-            score = self._calculate_matching_score(
-                donor=donor,
-                request=request,
-                distance=distance
-            )
-            
-            scored_requests.append({
+        distances = calculate_distances(
+            donor.latitude,
+            donor.longitude,
+            [request.hospital.latitude for request in compatible_requests],
+            [request.hospital.longitude for request in compatible_requests]
+        ).tolist()
+
+        scored_requests = (
+            {
                 'request': request,
-                'score': score,
+                'score': self._calculate_match_score(
+                    donor=donor,
+                    request=request,
+                    distance=distance
+                ),
                 'distance': distance
-            })
-        
-        # Sort by score (highest first)
-        return sorted(scored_requests, key=lambda x: x['score'], reverse=True)
-
-    def get_emergency_matches(self, request):
-        """Get immediate matches for emergency requests."""
-        # For emergency requests, increase max distance and adjust scoring
-        emergency_matches = self.find_matching_donors(
-            request,
-            max_distance=self.MAX_DISTANCE * 1.5  # 50% more distance for emergencies
+            }
+            for request, distance in zip(compatible_requests, distances)
+            # Skip if request is too far (or its hospital has no location)
+            if distance <= max_distance
         )
         
-        # Filter for highly scored matches only
-        return [match for match in emergency_matches if match['score'] > 0.7] 
\ No newline at end of file
+        # Rank by score (highest first)
+        return top_k(
+            scored_requests,
+            key=self._request_rank_key,
+            limit=limit,
+            after=self._decode_rank_cursor(cursor)
+        )
+
+    def get_emergency_matches(self, request, target_count=None, time_budget=None):
+        """Get immediate matches for emergency requests.
+
+        The search radius widens ring by ring (EMERGENCY_RINGS, reaching
+        beyond MAX_DISTANCE) and stops at the first ring holding target_count
+        donors scoring above EMERGENCY_MIN_SCORE. Candidates are fetched and
+        scored once, out to the widest ring, then bucketed by distance. It
+        never runs longer than time_budget seconds, hydration included;
+        results cut short by the budget are flagged partial.
+
+        Returns {'matches': [...], 'radius': km fully searched, 'partial': bool}.
+        """
+        deadline = time.monotonic() + (time_budget or self.EMERGENCY_TIME_BUDGET)
+        target_count = target_count or max(request.units_needed or 1, 1) * self.EMERGENCY_DONORS_PER_UNIT
+
+        candidates = []
+        partial = False
+        for candidate in self._score_donors(request, self.EMERGENCY_RINGS[-1]):
+            if -candidate[0] > self.EMERGENCY_MIN_SCORE:
+                candidates.append(candidate)
+            if time.monotonic() > deadline:
+                partial = True
+                break
+
+        # Rings are only complete once every candidate has been scored
+        searched = 0
+        if not partial:
+            candidates.sort(key=itemgetter(2))
+            found = 0
+            for radius in self.EMERGENCY_RINGS:
+                while found < len(candidates) and candidates[found][2] <= radius:
+                    found += 1
+                searched = radius
+                if found >= target_count:
+                    break
+            candidates = candidates[:found]
+
+        # The donors asked for are always loaded, the rest while time remains
+        ranked = top_k(candidates, key=itemgetter(0, 1))
+        matches = self._hydrate_donor_matches(ranked[:target_count])
+        for start in range(target_count, len(ranked), 500):
+            if time.monotonic() > deadline:
+                partial = True
+                break
+            matches.extend(self._hydrate_donor_matches(ranked[start:start + 500]))
+
+        return {
+            'matches': matches,
+            'radius': searched,
+            'partial': partial
+        }
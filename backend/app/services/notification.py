@@ -1,13 +1,20 @@
-from app import db, socketio
-from app.models.notification import Notification
-from datetime import datetime
+from flask import current_app
+from app import db
+from app.models.notification import Notification, NotificationCounter, NotificationReceipt
+from app.services.notification_dispatcher import enqueue_events, supersede_events
+from app.services.realtime import user_room
+from app.utils.pagination import encode_keyset_cursor, keyset_filter
+from sqlalchemy import case, cast, delete, func, insert, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from datetime import datetime, timedelta
 
 class NotificationService:
     def __init__(self):
         self.notification_types = {
             'blood_request': {
                 'title': 'New Blood Request',
-                'template': '{hospital_name} needs {blood_type} blood'
+                'template': '{hospital_name} needs {blood_type} blood',
+                'digest': '{count} new blood requests. Latest: {message}'
             },
             'request_response': {
                 'title': 'Donation Response',
@@ -19,97 +26,315 @@ class NotificationService:
             },
             'emergency': {
                 'title': 'Emergency Blood Request',
-                'template': 'URGENT: {hospital_name} needs {blood_type} blood immediately'
+                'template': 'URGENT: {hospital_name} needs {blood_type} blood immediately',
+                'digest': '{count} emergency requests. Latest: {message}'
             }
         }
+        self.INSERT_BATCH_SIZE = 1000  # Rows per bulk INSERT statement
+        self.COALESCE_WINDOW = 600  # Seconds an unread digest keeps absorbing new ones of its type
 
-    def create_notification(self, user_id, type, data):
-        """Create and save a new notification."""
+    def _render(self, type, data):
+        """Render a notification type's title and message."""
         template = self.notification_types.get(type)
         if not template:
             raise ValueError(f'Invalid notification type: {type}')
+        return template['title'], template['template'].format(**data)
 
-        notification = Notification(
-            user_id=user_id,
-            title=template['title'],
-            message=template['template'].format(**data),
-            type=type,
-            created_at=datetime.utcnow()
+    def _upsert(self, model):
+        """Get an INSERT supporting ON CONFLICT clauses for the current database."""
+        dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+        return dialect.insert(model)
+
+    def _add_unread(self, user_ids):
+        """Add one unread notification to each user's counter."""
+        if not user_ids:
+            return
+        db.session.execute(
+            self._upsert(NotificationCounter).on_conflict_do_update(
+                index_elements=[NotificationCounter.user_id],
+                set_={'unread_count': NotificationCounter.unread_count + 1}
+            ),
+            [{'user_id': user_id, 'unread_count': 1} for user_id in user_ids]
         )
 
-        db.session.add(notification)
-        db.session.commit()
+    def _remove_unread(self, user_id, count):
+        """Take count unread notifications off a user's counter."""
+        if count:
+            db.session.execute(
+                update(NotificationCounter)
+                .where(NotificationCounter.user_id == user_id)
+                .values(unread_count=case(
+                    (NotificationCounter.unread_count > count, NotificationCounter.unread_count - count),
+                    else_=0
+                ))
+            )
 
-        # Emit real-time notification
-        socketio.emit(
-            'notification',
-            {
-                'id': notification.id,
-                'title': notification.title,
-                'message': notification.message,
-                'type': notification.type,
-                'created_at': notification.created_at.isoformat()
-            },
-            room=str(user_id)
+    def create_notification(self, user_id, type, data, idempotency_key=None):
+        """Create and save a new notification.
+
+        Returns the notification (a digest it was merged into, see
+        create_notifications), or None if it was dropped as a duplicate.
+        """
+        notification_ids = self.create_notifications([user_id], type, data, idempotency_key)
+        return db.session.get(Notification, notification_ids[0]) if notification_ids else None
+
+    def _claim(self, user_ids, idempotency_key, now):
+        """Record idempotency_key for these users; returns the users that did not hold it yet."""
+        claimed = set(db.session.scalars(
+            self._upsert(NotificationReceipt)
+            .on_conflict_do_nothing()
+            .returning(NotificationReceipt.user_id),
+            [{'user_id': user_id, 'idempotency_key': idempotency_key, 'created_at': now}
+             for user_id in user_ids]
+        ))
+        return [user_id for user_id in user_ids if user_id in claimed]
+
+    def _digest_message(self, type, message):
+        """SQL expression for a digest's message once it absorbs message."""
+        before, after = self.notification_types[type]['digest'].split('{count}')
+        return literal(before) + cast(Notification.count + 1, db.String) + literal(after.format(message=message))
+
+    def _coalesce(self, user_ids, type, message, now):
+        """Merge into each user's open digest of this type.
+
+        Only types with a digest template coalesce. Returns
+        {user_id: (id, count, created_at, message)} for the merged users.
+        """
+        window = current_app.config.get('NOTIFICATION_COALESCE_WINDOW', self.COALESCE_WINDOW)
+        if not window or 'digest' not in self.notification_types[type]:
+            return {}
+
+        open_digests = select(func.max(Notification.id)).where(
+            Notification.user_id.in_(user_ids),
+            Notification.type == type,
+            Notification.is_read == False,
+            Notification.created_at >= now - timedelta(seconds=window)
+        ).group_by(Notification.user_id)
+
+        merged = db.session.execute(
+            update(Notification)
+            .where(Notification.id.in_(open_digests))
+            .values(
+                count=Notification.count + 1,
+                message=self._digest_message(type, message),
+                updated_at=now
+            )
+            .returning(Notification.user_id, Notification.id, Notification.count,
+                       Notification.created_at, Notification.message),
+            execution_options={'synchronize_session': False}
         )
+        return {user_id: (notification_id, count, created_at, digest)
+                for user_id, notification_id, count, created_at, digest in merged}
 
-        return notification
+    def create_notifications(self, user_ids, type, data, idempotency_key=None):
+        """Create the same notification for many users at once.
 
-    def get_user_notifications(self, user_id, limit=50):
-        """Get notifications for a user."""
-        return Notification.query.filter_by(user_id=user_id)\
-            .order_by(Notification.created_at.desc())\
+        The message is rendered once and every row, with its outbox event,
+        is written through batched statements inside a single transaction.
+
+        Users already holding idempotency_key are skipped. For types with a
+        digest template (blood_request and emergency), a user with an unread
+        notification of the same type from the last
+        NOTIFICATION_COALESCE_WINDOW seconds gets that digest updated (its
+        count bumped, its message rewritten to the count and the latest
+        message, and any undelivered event for it superseded) instead of a
+        new row. Duplicate user ids are notified
+        once. Returns the ids of the notifications written, in user order.
+        """
+        title, message = self._render(type, data)
+        now = datetime.utcnow()
+        user_ids = list(dict.fromkeys(user_ids))
+
+        payload = {
+            'title': title,
+            'type': type
+        }
+        notification_ids = []
+        try:
+            for start in range(0, len(user_ids), self.INSERT_BATCH_SIZE):
+                batch = user_ids[start:start + self.INSERT_BATCH_SIZE]
+                if idempotency_key:
+                    batch = self._claim(batch, idempotency_key, now)
+                if not batch:
+                    continue
+
+                written = self._coalesce(batch, type, message, now)
+                supersede_events([notification_id for notification_id, _, _, _ in written.values()])
+
+                fresh = [user_id for user_id in batch if user_id not in written]
+                if fresh:
+                    # RETURNING user_id maps ids back without sort_by_parameter_order,
+                    # which would make SQLite insert row by row
+                    fresh_ids = dict(db.session.execute(
+                        insert(Notification).returning(Notification.user_id, Notification.id),
+                        [{
+                            'user_id': user_id,
+                            'title': title,
+                            'message': message,
+                            'type': type,
+                            'is_read': False,
+                            'count': 1,
+                            'created_at': now,
+                            'updated_at': now
+                        } for user_id in fresh]
+                    ).all())
+                    written.update((user_id, (fresh_ids[user_id], 1, now, message)) for user_id in fresh)
+                    self._add_unread(fresh)
+
+                events = []
+                for user_id in batch:
+                    notification_id, count, created_at, user_message = written[user_id]
+                    events.append((user_room(user_id), 'notification', dict(
+                        payload,
+                        id=notification_id,
+                        message=user_message,
+                        count=count,
+                        created_at=created_at.isoformat()
+                    ), notification_id))
+                    notification_ids.append(notification_id)
+                enqueue_events(events)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        return notification_ids
+
+    def get_user_notifications(self, user_id, limit=50, cursor=None, unread_only=False):
+        """Get a page of notifications for a user, newest first.
+
+        Pages are keyed on (created_at, id): pass the cursor of the last
+        notification of a page to get the next one. Raises ValueError for
+        an invalid cursor.
+        """
+        query = Notification.query.filter(Notification.user_id == user_id)
+        if unread_only:
+            query = query.filter(Notification.is_read == False)
+
+        query = keyset_filter(query, Notification.created_at, Notification.id, cursor)
+
+        return query.order_by(Notification.created_at.desc(), Notification.id.desc())\
             .limit(limit).all()
 
+    def notification_cursor(self, notification):
+        """Get the cursor token continuing a feed after notification."""
+        return encode_keyset_cursor(notification.created_at, notification.id)
+
+    def get_unread_count(self, user_id):
+        """Get the number of unread notifications for a user."""
+        count = db.session.query(NotificationCounter.unread_count)\
+            .filter(NotificationCounter.user_id == user_id).scalar()
+        return count or 0
+
     def mark_as_read(self, notification_id, user_id):
-        """Mark a notification as read."""
-        notification = Notification.query.filter_by(
-            id=notification_id,
-            user_id=user_id
-        ).first()
+        """Mark a notification as read.
 
-        if notification:
-            notification.is_read = True
+        The read flag flips in one conditional UPDATE, so of two concurrent
+        calls only the one that changed the row takes it off the counter.
+        """
+        result = db.session.execute(
+            update(Notification)
+            .where(
+                Notification.id == notification_id,
+                Notification.user_id == user_id,
+                Notification.is_read == False
+            )
+            .values(is_read=True),
+            execution_options={'synchronize_session': False}
+        )
+        if result.rowcount == 1:
+            self._remove_unread(user_id, 1)
             db.session.commit()
             return True
-        return False
+
+        db.session.rollback()
+        return db.session.query(
+            Notification.query.filter_by(id=notification_id, user_id=user_id).exists()
+        ).scalar()
 
     def delete_notification(self, notification_id, user_id):
-        """Delete a notification."""
-        notification = Notification.query.filter_by(
-            id=notification_id,
-            user_id=user_id
+        """Delete a notification, taking it off the counter if it was still unread."""
+        was_read = db.session.scalars(
+            delete(Notification)
+            .where(Notification.id == notification_id, Notification.user_id == user_id)
+            .returning(Notification.is_read),
+            execution_options={'synchronize_session': False}
         ).first()
 
-        if notification:
-            db.session.delete(notification)
-            db.session.commit()
-            return True
-        return False
-
-    def send_blood_request_notification(self, donor_ids, hospital_name, blood_type):
-        """Send notifications for a new blood request."""
-        for donor_id in donor_ids:
-            self.create_notification(
-                donor_id,
-                'blood_request',
-                {
-                    'hospital_name': hospital_name,
-                    'blood_type': blood_type
-                }
-            )
+        if was_read is None:
+            db.session.rollback()
+            return False
+        if not was_read:
+            self._remove_unread(user_id, 1)
+        db.session.commit()
+        return True
+
+    def mark_all_as_read(self, user_id):
+        """Mark every unread notification of a user as read; returns the number updated."""
+        result = db.session.execute(
+            update(Notification)
+            .where(Notification.user_id == user_id, Notification.is_read == False)
+            .values(is_read=True)
+        )
+        db.session.execute(
+            update(NotificationCounter)
+            .where(NotificationCounter.user_id == user_id)
+            .values(unread_count=0)
+        )
+        db.session.commit()
+        return result.rowcount
 
-    def send_emergency_notification(self, donor_ids, hospital_name, blood_type):
-        """Send emergency blood request notifications."""
-        for donor_id in donor_ids:
-            self.create_notification(
-                donor_id,
-                'emergency',
-                {
-                    'hospital_name': hospital_name,
-                    'blood_type': blood_type
-                }
+    def mark_many_as_read(self, notification_ids, user_id):
+        """Mark the given notifications of a user as read; returns the number updated."""
+        if not notification_ids:
+            return 0
+        result = db.session.execute(
+            update(Notification)
+            .where(
+                Notification.id.in_(notification_ids),
+                Notification.user_id == user_id,
+                Notification.is_read == False
             )
+            .values(is_read=True)
+        )
+        self._remove_unread(user_id, result.rowcount)
+        db.session.commit()
+        return result.rowcount
+
+    def delete_older_than(self, user_id, before):
+        """Delete a user's notifications created before a datetime; returns the number deleted."""
+        was_read = db.session.scalars(
+            delete(Notification)
+            .where(Notification.user_id == user_id, Notification.created_at < before)
+            .returning(Notification.is_read)
+        ).all()
+        self._remove_unread(user_id, was_read.count(False))
+        db.session.commit()
+        return len(was_read)
+
+    def send_blood_request_notification(self, donor_ids, hospital_name, blood_type, request_id=None):
+        """Send notifications for a new blood request (once per donor and request)."""
+        return self.create_notifications(
+            donor_ids,
+            'blood_request',
+            {
+                'hospital_name': hospital_name,
+                'blood_type': blood_type
+            },
+            idempotency_key=f'blood_request:{request_id}' if request_id is not None else None
+        )
+
+    def send_emergency_notification(self, donor_ids, hospital_name, blood_type, request_id=None):
+        """Send emergency blood request notifications (once per donor and request)."""
+        return self.create_notifications(
+            donor_ids,
+            'emergency',
+            {
+                'hospital_name': hospital_name,
+                'blood_type': blood_type
+            },
+            idempotency_key=f'emergency:{request_id}' if request_id is not None else None
+        )
 
     def send_donation_reminder(self, donor_id):
         """Send donation eligibility reminder."""
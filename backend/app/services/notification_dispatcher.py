@@ -0,0 +1,317 @@
+from datetime import datetime, timedelta
+import logging
+import os
+import socket
+import threading
+import uuid
+
+from sqlalchemy import delete, insert, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db, socketio
+from app.models.notification import NotificationDispatchLease, NotificationOutbox
+from app.services.commit_hooks import on_commit, stage_many
+
+logger = logging.getLogger(__name__)
+
+def enqueue_events(events):
+    """Add (room, event, payload, notification_id) tuples to the outbox in the current transaction.
+
+    notification_id may be None for events not tied to a notification row.
+    The caller commits; nothing is sent unless that commit succeeds.
+    """
+    now = datetime.utcnow()
+    rows = [{
+        'room': room,
+        'notification_id': notification_id,
+        'event': event,
+        'payload': payload,
+        'attempts': 0,
+        'available_at': now,
+        'created_at': now
+    } for room, event, payload, notification_id in events]
+    if rows:
+        db.session.execute(insert(NotificationOutbox), rows)
+        stage_many(db.session, _WAKE_KEY, {'events': True})
+
+def supersede_events(notification_ids):
+    """Drop undelivered events for these notifications, in the current transaction.
+
+    Used when a notification changes again before its previous event went
+    out, so the client only receives the latest state.
+    """
+    if notification_ids:
+        db.session.execute(
+            delete(NotificationOutbox).where(NotificationOutbox.notification_id.in_(notification_ids)),
+            execution_options={'synchronize_session': False}
+        )
+
+class NotificationDispatcher:
+    """Background worker pushing outbox events to Socket.IO.
+
+    Events are delivered in outbox order, so each room receives them in the
+    order they were written. A failed emit is retried with exponential
+    backoff, and later events for the same room wait until it goes through
+    or is dropped after max_attempts.
+
+    Any number of processes may run a dispatcher: only the holder of the
+    outbox lease dispatches, and each batch is claimed (its rows pushed
+    past lease_seconds) before it is emitted, so an event is never sent by
+    two processes at once. Events claimed by a process that died become
+    due again when the claim runs out.
+    """
+
+    LEASE_NAME = 'outbox'
+
+    def __init__(self, batch_size=500, poll_interval=0.5, max_attempts=5, lease_seconds=30,
+                 idle_interval=5):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.idle_interval = idle_interval
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.app = None
+        self._running = False
+        self._leader = False
+        self._renew_at = None
+        self._lock = threading.Lock()
+        self._woken = threading.Event()
+        self._delivered = 0
+        self._retried = 0
+        self._dropped = 0
+        self._total_lag = 0.0
+        self._last_lag = None
+        self._max_lag = 0.0
+
+    def init_app(self, app):
+        self.app = app
+        self.batch_size = app.config.get('NOTIFICATION_DISPATCH_BATCH_SIZE', self.batch_size)
+        self.poll_interval = app.config.get('NOTIFICATION_DISPATCH_INTERVAL', self.poll_interval)
+        self.idle_interval = app.config.get('NOTIFICATION_DISPATCH_IDLE_INTERVAL', self.idle_interval)
+        self.max_attempts = app.config.get('NOTIFICATION_DISPATCH_MAX_ATTEMPTS', self.max_attempts)
+        self.lease_seconds = app.config.get('NOTIFICATION_DISPATCH_LEASE', self.lease_seconds)
+        self.start()
+
+    def start(self):
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        socketio.start_background_task(self.run)
+
+    def stop(self):
+        self._running = False
+        self._woken.set()
+
+    def wake(self):
+        """Check the outbox right away, after events were committed in this process."""
+        self._woken.set()
+
+    def _sleep(self, seconds):
+        """Sleep up to seconds, in poll_interval steps so wake() cuts it short."""
+        slept = 0
+        while self._running and not self._woken.is_set() and slept < seconds:
+            socketio.sleep(self.poll_interval)
+            slept += self.poll_interval
+        self._woken.clear()
+
+    def run(self):
+        """Drain the outbox while holding the lease, backing off while it stays empty.
+
+        An idle outbox costs one read-only check per idle period, which
+        doubles from poll_interval up to idle_interval; no write lock is
+        taken until there is something to send. Events committed in this
+        process wake the loop at once.
+        """
+        idle = self.poll_interval
+        while self._running:
+            delivered = 0
+            due = False
+            with self.app.app_context():
+                try:
+                    due = self.has_due_events()
+                    if due:
+                        self._leader = self.acquire_lease()
+                        if self._leader:
+                            delivered = self.dispatch_batch()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Notification dispatch failed: {str(e)}")
+            if delivered >= self.batch_size:
+                continue
+            idle = self.poll_interval if due else min(idle * 2, self.idle_interval)
+            self._sleep(idle)
+
+        if self._leader:
+            with self.app.app_context():
+                self.release_lease()
+
+    def _upsert(self, model):
+        dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+        return dialect.insert(model)
+
+    def has_due_events(self):
+        """Read-only check for outbox events ready to send."""
+        due = db.session.query(
+            select(NotificationOutbox.id).where(NotificationOutbox.available_at <= datetime.utcnow()).exists()
+        ).scalar()
+        db.session.commit()
+        return due
+
+    def acquire_lease(self):
+        """Take or renew the outbox lease; returns whether this process holds it.
+
+        The lease is only written when it is free, expired, or this
+        process' own and past half its term; a lease held by another
+        process is seen with a read.
+        """
+        now = datetime.utcnow()
+        if self._leader and now < self._renew_at:
+            return True
+
+        lease = NotificationDispatchLease
+        current = db.session.get(lease, self.LEASE_NAME)
+        if current is not None and current.owner != self.worker_id and current.expires_at > now:
+            db.session.commit()
+            self._leader = False
+            return False
+        values = {'owner': self.worker_id, 'expires_at': now + timedelta(seconds=self.lease_seconds)}
+        held = db.session.execute(
+            self._upsert(lease)
+            .values(name=self.LEASE_NAME, **values)
+            .on_conflict_do_update(
+                index_elements=[lease.name],
+                set_=values,
+                where=or_(lease.expires_at < now, lease.owner == self.worker_id)
+            )
+            .returning(lease.owner)
+        ).first() is not None
+        db.session.commit()
+        self._leader = held
+        self._renew_at = now + timedelta(seconds=self.lease_seconds / 2)
+        return held
+
+    def release_lease(self):
+        """Let another process take over the lease right away."""
+        db.session.execute(
+            update(NotificationDispatchLease)
+            .where(
+                NotificationDispatchLease.name == self.LEASE_NAME,
+                NotificationDispatchLease.owner == self.worker_id
+            )
+            .values(expires_at=datetime.utcnow())
+        )
+        db.session.commit()
+        self._leader = False
+
+    def _claim(self, now):
+        """Claim the next batch of due events; returns them in outbox order.
+
+        Rooms with an event waiting on a retry or claimed elsewhere are held
+        back to keep their order. Claiming pushes available_at past the
+        lease in one conditional UPDATE, so rows claimed concurrently by
+        another process no longer match.
+        """
+        outbox = NotificationOutbox
+        held_back = select(outbox.room).where(outbox.available_at > now)
+        due = select(outbox.id).where(
+            outbox.available_at <= now,
+            outbox.room.notin_(held_back)
+        ).order_by(outbox.id).limit(self.batch_size)
+
+        claimed = db.session.execute(
+            update(outbox)
+            .where(outbox.id.in_(due), outbox.available_at <= now)
+            .values(available_at=now + timedelta(seconds=self.lease_seconds))
+            .returning(outbox.id, outbox.room, outbox.event, outbox.payload, outbox.attempts, outbox.created_at),
+            execution_options={'synchronize_session': False}
+        ).all()
+        db.session.commit()
+        return sorted(claimed, key=lambda row: row.id)
+
+    def dispatch_batch(self):
+        """Claim and emit one batch of due outbox events; returns how many were delivered."""
+        now = datetime.utcnow()
+        events = self._claim(now)
+
+        delivered_ids = []
+        released_ids = []
+        blocked_rooms = set()
+        for outbox_event in events:
+            if outbox_event.room in blocked_rooms:
+                released_ids.append(outbox_event.id)
+                continue
+            try:
+                socketio.emit(outbox_event.event, outbox_event.payload, room=outbox_event.room)
+            except Exception as e:
+                blocked_rooms.add(outbox_event.room)
+                self._record_failure(outbox_event, now, e)
+                continue
+            delivered_ids.append(outbox_event.id)
+            self._record_lag((datetime.utcnow() - outbox_event.created_at).total_seconds())
+
+        if delivered_ids:
+            db.session.execute(
+                delete(NotificationOutbox).where(NotificationOutbox.id.in_(delivered_ids)),
+                execution_options={'synchronize_session': False}
+            )
+        if released_ids:
+            # Queued behind a failed event: due again, held back by its retry
+            db.session.execute(
+                update(NotificationOutbox)
+                .where(NotificationOutbox.id.in_(released_ids))
+                .values(available_at=now),
+                execution_options={'synchronize_session': False}
+            )
+        db.session.commit()
+
+        self._delivered += len(delivered_ids)
+        return len(delivered_ids)
+
+    def _record_failure(self, outbox_event, now, error):
+        attempts = outbox_event.attempts + 1
+        if attempts >= self.max_attempts:
+            logger.error(
+                f"Dropping notification event {outbox_event.id} for room "
+                f"{outbox_event.room} after {attempts} attempts: {str(error)}"
+            )
+            db.session.execute(
+                delete(NotificationOutbox).where(NotificationOutbox.id == outbox_event.id),
+                execution_options={'synchronize_session': False}
+            )
+            self._dropped += 1
+        else:
+            db.session.execute(
+                update(NotificationOutbox)
+                .where(NotificationOutbox.id == outbox_event.id)
+                .values(attempts=attempts, available_at=now + timedelta(seconds=2 ** attempts)),
+                execution_options={'synchronize_session': False}
+            )
+            self._retried += 1
+
+    def _record_lag(self, lag):
+        self._last_lag = lag
+        self._max_lag = max(self._max_lag, lag)
+        self._total_lag += lag
+
+    def metrics(self):
+        """This process' delivery counters and lag (seconds from outbox write to emit)."""
+        return {
+            'worker': self.worker_id,
+            'running': self._running,
+            'leader': self._leader,
+            'pending': NotificationOutbox.query.count(),
+            'delivered': self._delivered,
+            'retried': self._retried,
+            'dropped': self._dropped,
+            'last_lag': self._last_lag,
+            'max_lag': self._max_lag,
+            'average_lag': self._total_lag / self._delivered if self._delivered else None
+        }
+
+notification_dispatcher = NotificationDispatcher()
+
+_WAKE_KEY = 'notification_outbox_wake'
+
+on_commit(_WAKE_KEY, lambda changes: notification_dispatcher.wake())
@@ -0,0 +1,172 @@
+from datetime import datetime, timedelta
+import logging
+import threading
+
+from sqlalchemy import delete, insert, literal, or_, select, text, tuple_
+
+from app import db, socketio
+from app.models.notification import Notification, NotificationArchive, NotificationReceipt
+
+logger = logging.getLogger(__name__)
+
+class NotificationRetention:
+    """Background job pruning read notifications past their type's TTL.
+
+    Expired rows are removed in chunks of ``batch_size``, each in its own
+    short transaction, so writers are never locked out for long. Unread
+    notifications are always kept. With ``archive`` set, rows are copied to
+    notification_archive before they are deleted.
+    """
+
+    def __init__(self, default_ttl=90, ttls=None, archive=False, batch_size=1000,
+                 interval=3600, vacuum='', receipt_ttl=7):
+        self.default_ttl = default_ttl  # days, 0 keeps notifications forever
+        self.ttls = dict(ttls or {})  # notification type -> days
+        self.receipt_ttl = receipt_ttl  # days idempotency keys are remembered
+        self.archive = archive
+        self.batch_size = batch_size
+        self.interval = interval
+        self.vacuum = vacuum
+        self.app = None
+        self.last_report = None
+        self._running = False
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.default_ttl = app.config.get('NOTIFICATION_RETENTION_DAYS', self.default_ttl)
+        self.ttls = dict(app.config.get('NOTIFICATION_RETENTION_TTLS', self.ttls))
+        self.archive = app.config.get('NOTIFICATION_RETENTION_ARCHIVE', self.archive)
+        self.batch_size = app.config.get('NOTIFICATION_RETENTION_BATCH_SIZE', self.batch_size)
+        self.interval = app.config.get('NOTIFICATION_RETENTION_INTERVAL', self.interval)
+        self.vacuum = app.config.get('NOTIFICATION_RETENTION_VACUUM', self.vacuum)
+        self.receipt_ttl = app.config.get('NOTIFICATION_IDEMPOTENCY_DAYS', self.receipt_ttl)
+        self.start()
+
+    def start(self):
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        socketio.start_background_task(self.run)
+
+    def stop(self):
+        self._running = False
+
+    def run(self):
+        while self._running:
+            with self.app.app_context():
+                try:
+                    self.run_once()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Notification retention failed: {str(e)}")
+            socketio.sleep(self.interval)
+
+    def _expiry_rules(self, now):
+        """Get (description, condition) pairs selecting expired read notifications."""
+        rules = []
+        for type, days in self.ttls.items():
+            if days > 0:
+                rules.append((type, (Notification.type == type) &
+                              (Notification.created_at < now - timedelta(days=days))))
+        if self.default_ttl > 0:
+            other = or_(Notification.type.is_(None), Notification.type.notin_(list(self.ttls)))
+            rules.append(('default', other &
+                          (Notification.created_at < now - timedelta(days=self.default_ttl))))
+        return rules
+
+    def run_once(self):
+        """Prune every expired notification and return a report of what was reclaimed."""
+        started = datetime.utcnow()
+        reclaimed = {}
+        for name, condition in self._expiry_rules(started):
+            reclaimed[name] = self._prune(condition)
+        receipts = self._prune_receipts(started - timedelta(days=self.receipt_ttl))
+
+        self.last_report = {
+            'started_at': started.isoformat(),
+            'duration': (datetime.utcnow() - started).total_seconds(),
+            'reclaimed': reclaimed,
+            'total': sum(reclaimed.values()),
+            'receipts': receipts,
+            'archived': self.archive,
+            'vacuum': self._vacuum() if any(reclaimed.values()) else None
+        }
+        logger.info(f"Notification retention reclaimed {self.last_report['total']} rows")
+        return self.last_report
+
+    def _prune(self, condition):
+        """Remove matching read notifications chunk by chunk; returns the number removed."""
+        removed = 0
+        while True:
+            ids = db.session.scalars(
+                select(Notification.id)
+                .where(Notification.is_read == True, condition)
+                .limit(self.batch_size)
+            ).all()
+            if not ids:
+                return removed
+
+            if self.archive:
+                db.session.execute(insert(NotificationArchive).from_select(
+                    ['id', 'user_id', 'title', 'message', 'type', 'count', 'created_at', 'archived_at'],
+                    select(
+                        Notification.id,
+                        Notification.user_id,
+                        Notification.title,
+                        Notification.message,
+                        Notification.type,
+                        Notification.count,
+                        Notification.created_at,
+                        literal(datetime.utcnow())
+                    ).where(Notification.id.in_(ids))
+                ))
+            db.session.execute(
+                delete(Notification).where(Notification.id.in_(ids)),
+                execution_options={'synchronize_session': False}
+            )
+            db.session.commit()
+            removed += len(ids)
+
+            # Let requests waiting on the database lock in between chunks
+            socketio.sleep(0)
+
+    def _prune_receipts(self, cutoff):
+        """Forget idempotency keys recorded before cutoff, chunk by chunk."""
+        removed = 0
+        while True:
+            expired = select(NotificationReceipt.user_id, NotificationReceipt.idempotency_key)\
+                .where(NotificationReceipt.created_at < cutoff)\
+                .limit(self.batch_size)
+            result = db.session.execute(
+                delete(NotificationReceipt).where(
+                    tuple_(NotificationReceipt.user_id, NotificationReceipt.idempotency_key).in_(expired)
+                ),
+                execution_options={'synchronize_session': False}
+            )
+            db.session.commit()
+            removed += result.rowcount
+            if result.rowcount < self.batch_size:
+                return removed
+            socketio.sleep(0)
+
+    def _vacuum(self):
+        """Give freed pages back to the file system (SQLite only)."""
+        if not self.vacuum or db.engine.dialect.name != 'sqlite':
+            return None
+
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            if self.vacuum == 'full':
+                connection.execute(text('VACUUM'))
+                return 'full'
+            if self.vacuum == 'incremental':
+                # Only databases created with auto_vacuum=INCREMENTAL support this
+                if connection.execute(text('PRAGMA auto_vacuum')).scalar() != 2:
+                    logger.warning("Incremental vacuum skipped: auto_vacuum is not INCREMENTAL")
+                    return None
+                connection.execute(text('PRAGMA incremental_vacuum')).fetchall()
+                return 'incremental'
+        return None
+
+notification_retention = NotificationRetention()
@@ -0,0 +1,58 @@
+from math import floor
+
+from app.services.notification_dispatcher import enqueue_events
+from app.utils.blood_types import get_compatible_donors
+
+# Coarse grid for regional broadcasts. Donors listen on their own cell and
+# the eight around it, so a request published to its hospital's cell reaches
+# donors roughly one cell (about 100 km north-south) away in any direction.
+REGION_CELL_SIZE = 1.0  # degrees
+REGION_LON_CELLS = int(round(360 / REGION_CELL_SIZE))
+REGION_LAT_CELLS = int(round(180 / REGION_CELL_SIZE))
+
+def user_room(user_id):
+    """Socket.IO room holding one user's connections."""
+    return f'user:{user_id}'
+
+def blood_type_room(blood_type):
+    """Socket.IO room holding the connections of donors of one blood type."""
+    return f'blood_type:{blood_type}'
+
+def region_cell(latitude, longitude):
+    """Get the (lat_cell, lon_cell) of the broadcast grid containing a location."""
+    lat_cell = min(floor((latitude + 90) / REGION_CELL_SIZE), REGION_LAT_CELLS - 1)
+    lon_cell = floor((longitude + 180) / REGION_CELL_SIZE) % REGION_LON_CELLS
+    return lat_cell, lon_cell
+
+def region_room(blood_type, cell):
+    """Socket.IO room holding the connections of donors of one blood type near a grid cell."""
+    return f'region:{blood_type}:{cell[0]}:{cell[1]}'
+
+def donor_region_rooms(blood_type, latitude, longitude):
+    """Get the regional rooms a donor at this location listens on."""
+    lat_cell, lon_cell = region_cell(latitude, longitude)
+    return [
+        region_room(blood_type, (lat, (lon_cell + d_lon) % REGION_LON_CELLS))
+        for lat in range(max(lat_cell - 1, 0), min(lat_cell + 1, REGION_LAT_CELLS - 1) + 1)
+        for d_lon in (-1, 0, 1)
+    ]
+
+def broadcast(rooms, event, payload):
+    """Queue one event per room in the current transaction; the caller commits."""
+    enqueue_events((room, event, payload, None) for room in dict.fromkeys(rooms))
+
+def broadcast_to_compatible_donors(recipient_blood_type, event, payload, latitude=None, longitude=None):
+    """Queue an event for every donor able to give to recipient_blood_type.
+
+    With a location the event goes to each compatible blood type's room for
+    that location's grid cell, otherwise to each compatible blood type's
+    room. Either way it is at most one event per blood type, whatever the
+    number of donors connected.
+    """
+    blood_types = get_compatible_donors(recipient_blood_type)
+    if latitude is None or longitude is None:
+        rooms = [blood_type_room(blood_type) for blood_type in blood_types]
+    else:
+        cell = region_cell(latitude, longitude)
+        rooms = [region_room(blood_type, cell) for blood_type in blood_types]
+    broadcast(rooms, event, payload)
@@ -0,0 +1,167 @@
+import logging
+
+from sqlalchemy import Column, Float, Integer, MetaData, Table, and_, event, or_, select, text, union_all
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.models.donor import Donor
+from app.models.hospital import Hospital
+from app.utils.geolocation import bounding_box, longitude_ranges
+
+logger = logging.getLogger(__name__)
+
+# R*Tree virtual tables live outside db.metadata so create_all() never tries
+# to create them as ordinary tables.
+rtree_metadata = MetaData()
+
+class LocationRTree:
+    """SQLite R*Tree mirror of a table's latitude/longitude columns.
+
+    Every located row is stored as a degenerate box (min == max) keyed by the
+    row id. Triggers on the source table keep the mirror in sync inside the
+    same transaction as the write, so the index can never drift.
+    """
+
+    def __init__(self, source_table):
+        self.source_table = source_table
+        self.name = f'{source_table}_rtree'
+        self.table = Table(
+            self.name,
+            rtree_metadata,
+            Column('id', Integer, primary_key=True),
+            Column('min_lat', Float),
+            Column('max_lat', Float),
+            Column('min_lon', Float),
+            Column('max_lon', Float)
+        )
+        self.enabled = False
+
+    def _ddl(self):
+        source, name = self.source_table, self.name
+        located = 'NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL'
+        return [
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {name}_insert AFTER INSERT ON {source}
+            WHEN {located}
+            BEGIN
+                INSERT OR REPLACE INTO {name}
+                VALUES (NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude);
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {name}_update AFTER UPDATE OF latitude, longitude ON {source}
+            BEGIN
+                DELETE FROM {name} WHERE id = OLD.id;
+                INSERT INTO {name}
+                SELECT NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude
+                WHERE {located};
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {name}_delete AFTER DELETE ON {source}
+            BEGIN
+                DELETE FROM {name} WHERE id = OLD.id;
+            END
+            """
+        ]
+
+    def install(self, connection):
+        """Create the virtual table and its triggers, backfilling on first install."""
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': self.name}
+        ).first() is not None
+
+        if not exists:
+            connection.execute(text(
+                f'CREATE VIRTUAL TABLE {self.name} '
+                f'USING rtree(id, min_lat, max_lat, min_lon, max_lon)'
+            ))
+            connection.execute(text(f"""
+                INSERT INTO {self.name}
+                SELECT id, latitude, latitude, longitude, longitude
+                FROM {self.source_table}
+                WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+            """))
+
+        for statement in self._ddl():
+            connection.execute(text(statement))
+
+        self.enabled = True
+
+    def drop(self, connection):
+        connection.execute(text(f'DROP TABLE IF EXISTS {self.name}'))
+        self.enabled = False
+
+    def within(self, latitude, longitude, radius):
+        """Select ids whose location falls inside the radius' bounding box.
+
+        Returns a selectable suitable for ``column.in_(...)``; exact distances
+        still have to be checked by the caller. R*Tree coordinates are stored
+        as float32 rounded outwards, so boxes are matched on overlap rather
+        than containment to keep points on the edge of the search box.
+        """
+        min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius)
+        table = self.table
+        selects = [
+            select(table.c.id).where(
+                table.c.max_lat >= min_lat,
+                table.c.min_lat <= max_lat,
+                table.c.max_lon >= low,
+                table.c.min_lon <= high
+            )
+            for low, high in longitude_ranges(min_lon, max_lon)
+        ]
+        return selects[0] if len(selects) == 1 else union_all(*selects)
+
+def within_bounding_box(columns, rtree, latitude, longitude, radius):
+    """Build a SQL condition keeping rows inside the radius' bounding box.
+
+    columns is a model or a table's ``.c`` with id, latitude and longitude.
+    The box is resolved by the R*Tree when installed, otherwise by range
+    conditions on the location columns.
+    """
+    if rtree.enabled:
+        return columns.id.in_(rtree.within(latitude, longitude, radius))
+
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius)
+    return and_(
+        columns.latitude.between(min_lat, max_lat),
+        or_(*[
+            columns.longitude.between(low, high)
+            for low, high in longitude_ranges(min_lon, max_lon)
+        ])
+    )
+
+donor_rtree = LocationRTree(Donor.__tablename__)
+hospital_rtree = LocationRTree(Hospital.__tablename__)
+
+def install_spatial_rtrees():
+    """Install the R*Tree location indexes when the database supports them."""
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        logger.info("Spatial R*Tree disabled: database is not SQLite")
+        return False
+
+    try:
+        with engine.begin() as connection:
+            for rtree in (donor_rtree, hospital_rtree):
+                rtree.install(connection)
+    except OperationalError as e:
+        # SQLite builds without the R*Tree module fall back to bounding-box queries
+        logger.warning(f"Spatial R*Tree unavailable: {str(e)}")
+        donor_rtree.enabled = hospital_rtree.enabled = False
+        return False
+
+    return True
+
+def _drop_with_source(rtree):
+    """Drop the R*Tree alongside its source table (e.g. from recreate_db.py)."""
+    def _drop(target, connection, **kw):
+        if connection.dialect.name == 'sqlite':
+            rtree.drop(connection)
+
+    return _drop
+
+event.listen(Donor.__table__, 'before_drop', _drop_with_source(donor_rtree))
+event.listen(Hospital.__table__, 'before_drop', _drop_with_source(hospital_rtree))
@@ -0,0 +1,259 @@
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, event, func, select, text
+
+from app import db
+from app.models.donation import Donation
+from app.models.donor import Donor
+from app.models.hospital import Hospital
+from app.models.request import BloodRequest
+from app.models.statistics import DailyDonationStatistic, StatisticCounter
+
+logger = logging.getLogger(__name__)
+
+_counters = StatisticCounter.__tablename__
+_daily = DailyDonationStatistic.__tablename__
+_donors = Donor.__tablename__
+_hospitals = Hospital.__tablename__
+_requests = BloodRequest.__tablename__
+_donations = Donation.__tablename__
+
+def _bump(name, delta, condition='1'):
+    """Add delta to the counter named by the SQL expression name when condition holds."""
+    return f"""
+        INSERT INTO {_counters} (name, value) SELECT {name}, {delta} WHERE {condition}
+        ON CONFLICT (name) DO UPDATE SET value = value + excluded.value;
+    """
+
+def _bump_day(row, sign):
+    """Add (sign '+') or remove (sign '-') the donation row (NEW or OLD) from its daily bucket."""
+    return f"""
+        INSERT INTO {_daily} (day, hospital_id, blood_type, status, donations, units)
+        SELECT date({row}.donation_date), {row}.hospital_id, {row}.blood_type,
+               IFNULL({row}.status, 'completed'), {sign}1, {sign}IFNULL({row}.units, 0)
+        WHERE 1
+        ON CONFLICT (day, hospital_id, blood_type, status) DO UPDATE SET
+            donations = donations + excluded.donations,
+            units = units + excluded.units;
+    """
+
+def _open(row):
+    return f"{row}.status = 'open'"
+
+# name -> (trigger event, body)
+_TRIGGERS = {
+    'donors_insert': (
+        f'AFTER INSERT ON {_donors}',
+        _bump("'donors'", 1) + _bump("'donors.' || NEW.blood_type", 1)
+    ),
+    'donors_update': (
+        f'AFTER UPDATE OF blood_type ON {_donors} WHEN OLD.blood_type IS NOT NEW.blood_type',
+        _bump("'donors.' || OLD.blood_type", -1) + _bump("'donors.' || NEW.blood_type", 1)
+    ),
+    'donors_delete': (
+        f'AFTER DELETE ON {_donors}',
+        _bump("'donors'", -1) + _bump("'donors.' || OLD.blood_type", -1)
+    ),
+    'hospitals_insert': (f'AFTER INSERT ON {_hospitals}', _bump("'hospitals'", 1)),
+    'hospitals_delete': (f'AFTER DELETE ON {_hospitals}', _bump("'hospitals'", -1)),
+    'requests_insert': (
+        f'AFTER INSERT ON {_requests}',
+        _bump("'open_requests'", 1, _open('NEW'))
+        + _bump("'open_requests.' || NEW.urgency_level", 1, _open('NEW'))
+    ),
+    'requests_update': (
+        f'AFTER UPDATE OF status, urgency_level ON {_requests}',
+        _bump("'open_requests'", -1, _open('OLD'))
+        + _bump("'open_requests.' || OLD.urgency_level", -1, _open('OLD'))
+        + _bump("'open_requests'", 1, _open('NEW'))
+        + _bump("'open_requests.' || NEW.urgency_level", 1, _open('NEW'))
+    ),
+    'requests_delete': (
+        f'AFTER DELETE ON {_requests}',
+        _bump("'open_requests'", -1, _open('OLD'))
+        + _bump("'open_requests.' || OLD.urgency_level", -1, _open('OLD'))
+    ),
+    'donations_insert': (
+        f'AFTER INSERT ON {_donations}',
+        _bump("'donations'", 1) + _bump_day('NEW', '+')
+    ),
+    'donations_update': (
+        f'AFTER UPDATE OF donation_date, hospital_id, blood_type, status, units ON {_donations}',
+        _bump_day('OLD', '-') + _bump_day('NEW', '+')
+    ),
+    'donations_delete': (
+        f'AFTER DELETE ON {_donations}',
+        _bump("'donations'", -1) + _bump_day('OLD', '-')
+    ),
+}
+
+class MaterializedStatistics:
+    """Dashboard aggregates kept up to date by SQLite triggers.
+
+    The triggers sit on the donors, hospitals, blood_requests and donations
+    tables and update StatisticCounter and DailyDonationStatistic inside the
+    same transaction as each write, bulk and set-based writes included, so
+    the aggregates can never drift from the rows they count.
+    """
+
+    def __init__(self):
+        self.enabled = False
+
+    @staticmethod
+    def _trigger_name(name):
+        return f'statistics_{name}'
+
+    def rebuild(self, connection):
+        """Recompute every aggregate from the source tables."""
+        connection.execute(delete(StatisticCounter))
+        connection.execute(delete(DailyDonationStatistic))
+        connection.execute(text(f"""
+            INSERT INTO {_counters} (name, value)
+            SELECT 'donors', COUNT(*) FROM {_donors}
+            UNION ALL
+            SELECT 'donors.' || blood_type, COUNT(*) FROM {_donors} GROUP BY blood_type
+            UNION ALL
+            SELECT 'hospitals', COUNT(*) FROM {_hospitals}
+            UNION ALL
+            SELECT 'donations', COUNT(*) FROM {_donations}
+            UNION ALL
+            SELECT 'open_requests', COUNT(*) FROM {_requests} WHERE status = 'open'
+            UNION ALL
+            SELECT 'open_requests.' || urgency_level, COUNT(*) FROM {_requests}
+            WHERE status = 'open' GROUP BY urgency_level
+        """))
+        connection.execute(text(f"""
+            INSERT INTO {_daily} (day, hospital_id, blood_type, status, donations, units)
+            SELECT date(donation_date), hospital_id, blood_type, IFNULL(status, 'completed'),
+                   COUNT(*), SUM(IFNULL(units, 0))
+            FROM {_donations}
+            GROUP BY 1, 2, 3, 4
+        """))
+
+    def install(self, connection):
+        """Create the triggers, backfilling the aggregates on first install."""
+        installed = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = :name"),
+            {'name': self._trigger_name('donations_insert')}
+        ).first() is not None
+
+        if not installed:
+            self.rebuild(connection)
+
+        for name, (trigger_event, body) in _TRIGGERS.items():
+            connection.execute(text(
+                f'CREATE TRIGGER IF NOT EXISTS {self._trigger_name(name)} {trigger_event} '
+                f'BEGIN {body} END'
+            ))
+
+        self.enabled = True
+
+    def drop(self, connection):
+        for name in _TRIGGERS:
+            connection.execute(text(f'DROP TRIGGER IF EXISTS {self._trigger_name(name)}'))
+        self.enabled = False
+
+materialized_statistics = MaterializedStatistics()
+
+def install_materialized_statistics():
+    """Install the statistics triggers when the database is SQLite."""
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        logger.info("Materialized statistics disabled: database is not SQLite")
+        return False
+
+    with engine.begin() as connection:
+        materialized_statistics.install(connection)
+    return True
+
+def _drop_triggers(target, connection, **kw):
+    """Drop the triggers with the aggregate tables so writes never hit a missing table."""
+    if connection.dialect.name == 'sqlite':
+        materialized_statistics.drop(connection)
+
+event.listen(StatisticCounter.__table__, 'before_drop', _drop_triggers)
+event.listen(DailyDonationStatistic.__table__, 'before_drop', _drop_triggers)
+
+class StatisticsService:
+    RECENT_DAYS = 30
+    MAX_SERIES_DAYS = 366
+
+    def _live_counters(self):
+        """Compute the counters from the source tables (when not materialized)."""
+        counters = {
+            'donors': Donor.query.count(),
+            'hospitals': Hospital.query.count(),
+            'donations': Donation.query.count(),
+            'open_requests': BloodRequest.query.filter_by(status='open').count()
+        }
+        for blood_type, count in db.session.query(Donor.blood_type, func.count(Donor.id))\
+                .group_by(Donor.blood_type):
+            counters[f'donors.{blood_type}'] = count
+        for urgency, count in db.session.query(BloodRequest.urgency_level, func.count(BloodRequest.id))\
+                .filter(BloodRequest.status == 'open')\
+                .group_by(BloodRequest.urgency_level):
+            counters[f'open_requests.{urgency}'] = count
+        return counters
+
+    def _grouped(self, counters, prefix):
+        return {
+            name[len(prefix):]: value
+            for name, value in counters.items()
+            if name.startswith(prefix) and value
+        }
+
+    def dashboard(self):
+        """Get the admin dashboard figures."""
+        if materialized_statistics.enabled:
+            counters = dict(db.session.execute(select(StatisticCounter.name, StatisticCounter.value)).all())
+        else:
+            counters = self._live_counters()
+
+        recent = self.donation_series(self.RECENT_DAYS)
+        return {
+            'total_donors': counters.get('donors', 0),
+            'total_hospitals': counters.get('hospitals', 0),
+            'total_donations': counters.get('donations', 0),
+            'active_requests': counters.get('open_requests', 0),
+            'blood_type_distribution': self._grouped(counters, 'donors.'),
+            'active_requests_by_urgency': self._grouped(counters, 'open_requests.'),
+            'recent_donations': sum(day['donations'] for day in recent)
+        }
+
+    def donation_series(self, days, hospital_id=None, blood_type=None, status=None):
+        """Get donations and units per day for the last `days` days, oldest first.
+
+        Days without donations are included with zeros. Reads the daily
+        aggregates when materialized, the donations table otherwise.
+        Raises ValueError if days is not between 1 and MAX_SERIES_DAYS.
+        """
+        if not 1 <= days <= self.MAX_SERIES_DAYS:
+            raise ValueError(f'days must be an integer between 1 and {self.MAX_SERIES_DAYS}')
+        first_day = datetime.utcnow().date() - timedelta(days=days - 1)
+
+        if materialized_statistics.enabled:
+            table = DailyDonationStatistic
+            day = table.day
+            query = db.session.query(day, func.sum(table.donations), func.sum(table.units))\
+                .filter(day >= first_day)
+        else:
+            table = Donation
+            day = func.date(Donation.donation_date)
+            query = db.session.query(day, func.count(Donation.id), func.sum(Donation.units))\
+                .filter(Donation.donation_date >= datetime.combine(first_day, datetime.min.time()))
+
+        if hospital_id is not None:
+            query = query.filter(table.hospital_id == hospital_id)
+        if blood_type:
+            query = query.filter(table.blood_type == blood_type)
+        if status:
+            query = query.filter(table.status == status)
+
+        totals = {str(row[0]): (row[1] or 0, row[2] or 0) for row in query.group_by(day)}
+        series = []
+        for offset in range(days):
+            current = (first_day + timedelta(days=offset)).isoformat()
+            donations, units = totals.get(current, (0, 0))
+            series.append({'date': current, 'donations': donations, 'units': units})
+        return series
@@ -0,0 +1,227 @@
+import csv
+import io
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+import threading
+from itertools import islice
+
+from flask import current_app
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.models.donor import Donor
+from app.models.hospital import Hospital
+from app.models.user import User
+from app.services import donor_snapshot
+from app.utils.validators import validate_blood_type, validate_coordinates, validate_email, validate_phone
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+_hash_pool = None
+_hash_pool_lock = threading.Lock()
+
+def _get_hash_pool(workers):
+    """Get the process pool shared by every import, created on first use."""
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is None:
+            _hash_pool = ProcessPoolExecutor(max_workers=workers)
+        return _hash_pool
+
+def _lines(stream):
+    return io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+def _iter_csv(stream):
+    yield from csv.DictReader(_lines(stream))
+
+def _iter_ndjson(stream):
+    for line in _lines(stream):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+class UserImportService:
+    CHUNK_SIZE = 1000  # Rows validated, hashed and inserted per transaction
+    HASH_WORKERS = 0  # Password hashing processes, 0 for one per CPU
+    INLINE_HASH_ROWS = 32  # Chunks with fewer passwords are hashed without the pool
+    MAX_REPORTED_ERRORS = 1000
+
+    FIELDS = {
+        'donor': ['email', 'password', 'name', 'blood_type', 'phone', 'address', 'latitude', 'longitude'],
+        'hospital': ['email', 'password', 'name', 'address', 'phone', 'license_number', 'latitude', 'longitude']
+    }
+    REQUIRED_FIELDS = {
+        'donor': ['email', 'password', 'name', 'blood_type'],
+        'hospital': ['email', 'password', 'name', 'address']
+    }
+    MODELS = {'donor': Donor, 'hospital': Hospital}
+
+    def read_rows(self, stream, format):
+        """Iterate the rows of a binary CSV (with a header line) or NDJSON stream.
+
+        Rows are dicts; an NDJSON line that is not valid JSON comes back as
+        None so it can be reported against its row number.
+        Raises ValueError if format is not one of IMPORT_FORMATS.
+        """
+        if format not in IMPORT_FORMATS:
+            raise ValueError(f'format must be one of: {", ".join(IMPORT_FORMATS)}')
+        return _iter_csv(stream) if format == 'csv' else _iter_ndjson(stream)
+
+    def _clean(self, row, default_type=None):
+        """Validate one row into (values, password, errors)."""
+        if not isinstance(row, dict):
+            return None, None, ['Row must be a JSON object']
+
+        row = {
+            str(key).strip(): value.strip() if isinstance(value, str) else value
+            for key, value in row.items()
+            if key is not None and value not in (None, '')
+        }
+        user_type = row.get('user_type', default_type)
+        if user_type not in self.FIELDS:
+            return None, None, ['user_type must be donor or hospital']
+
+        errors = [f'{field} is required' for field in self.REQUIRED_FIELDS[user_type] if field not in row]
+        values = {field: row.get(field) for field in self.FIELDS[user_type]}
+        for field in ('email', 'password', 'name', 'blood_type', 'phone', 'address', 'license_number'):
+            if values.get(field) is not None:
+                values[field] = str(values[field])
+
+        if values['email'] and not validate_email(values['email']):
+            errors.append('Invalid email')
+        if values.get('blood_type') and not validate_blood_type(values['blood_type']):
+            errors.append('Invalid blood type')
+        if values['phone'] and not validate_phone(values['phone']):
+            errors.append('Invalid phone number')
+        if values['latitude'] is not None or values['longitude'] is not None:
+            if not validate_coordinates(values['latitude'], values['longitude']):
+                errors.append('Invalid coordinates')
+            else:
+                values['latitude'] = float(values['latitude'])
+                values['longitude'] = float(values['longitude'])
+
+        if errors:
+            return None, None, errors
+        values['user_type'] = user_type
+        return values, values.pop('password'), []
+
+    def _insert(self, user_type, rows):
+        """Insert user rows, then their donors/hospitals rows; returns their ids in row order.
+
+        Plain table inserts batch into a few multi-row statements where the
+        ORM would insert every user row on its own to learn its id.
+        """
+        users = User.__table__
+        model = self.MODELS[user_type]
+        ids = dict(db.session.execute(
+            insert(users).returning(users.c.email, users.c.id),
+            [{column: row[column] for column in ('email', 'password_hash', 'user_type')} for row in rows]
+        ).all())
+
+        subclass = model.__table__
+        columns = [column.key for column in subclass.c if column.key in self.FIELDS[user_type]]
+        row_ids = [ids[row['email']] for row in rows]
+        db.session.execute(
+            insert(subclass),
+            [dict({column: row[column] for column in columns}, id=row_id) for row, row_id in zip(rows, row_ids)]
+        )
+        return row_ids
+
+    def _hash_passwords(self, passwords, workers):
+        """Hash passwords in the shared pool, or inline when the pool would not pay off."""
+        if workers < 2 or len(passwords) < self.INLINE_HASH_ROWS:
+            return [generate_password_hash(password) for password in passwords]
+        pool = _get_hash_pool(workers)
+        return pool.map(generate_password_hash, passwords, chunksize=max(1, len(passwords) // (4 * workers)))
+
+    def _import_chunk(self, chunk, default_type, workers, seen, report):
+        def reject(number, email, errors):
+            report['failed'] += 1
+            if len(report['errors']) < self.MAX_REPORTED_ERRORS:
+                report['errors'].append({'row': number, 'email': email, 'errors': errors})
+
+        valid = []
+        for number, row in chunk:
+            values, password, errors = self._clean(row, default_type)
+            if errors:
+                reject(number, row.get('email') if isinstance(row, dict) else None, errors)
+            elif values['email'] in seen:
+                reject(number, values['email'], ['Email appears earlier in the file'])
+            else:
+                seen.add(values['email'])
+                valid.append((number, values, password))
+        if not valid:
+            return
+
+        # One query for every email of the chunk already registered
+        registered = set(db.session.scalars(
+            select(User.email).where(User.email.in_([values['email'] for _, values, _ in valid]))
+        ))
+        for number, values, _ in valid:
+            if values['email'] in registered:
+                reject(number, values['email'], ['Email already registered'])
+        valid = [item for item in valid if item[1]['email'] not in registered]
+        if not valid:
+            return
+
+        passwords = [password for _, _, password in valid]
+        hashes = self._hash_passwords(passwords, workers)
+        for (_, values, _), password_hash in zip(valid, hashes):
+            values['password_hash'] = password_hash
+
+        by_type = {}
+        for item in valid:
+            by_type.setdefault(item[1]['user_type'], []).append(item)
+        try:
+            for user_type, items in by_type.items():
+                rows = [values for _, values, _ in items]
+                ids = self._insert(user_type, rows)
+                if user_type == 'donor':
+                    donors = [
+                        dict(values, id=donor_id, is_available=True, last_donation_date=None)
+                        for values, donor_id in zip(rows, ids)
+                    ]
+                    donor_snapshot.stage_donors(db.session, donors)
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error(f"Error importing users: {str(e)}")
+            for number, values, _ in valid:
+                reject(number, values['email'], ['Could not be saved'])
+            return
+        report['imported'] += len(valid)
+
+    def import_users(self, rows, default_type=None):
+        """Register donors and hospitals in bulk.
+
+        Rows are dicts of registration fields plus user_type (default_type
+        when missing). Each chunk of rows is validated, checked against the
+        registered emails in one query, hashed (in a process pool shared by
+        all imports, for large chunks on several CPUs) and inserted in its
+        own transaction, so a bad row never blocks the rest.
+        Returns {'total', 'imported', 'failed', 'errors'}, errors listing the
+        first MAX_REPORTED_ERRORS rejected rows by row number.
+        """
+        chunk_size = current_app.config.get('USER_IMPORT_CHUNK_SIZE', self.CHUNK_SIZE)
+        workers = current_app.config.get('USER_IMPORT_HASH_WORKERS', self.HASH_WORKERS) or os.cpu_count()
+        report = {'total': 0, 'imported': 0, 'failed': 0, 'errors': []}
+        seen = set()
+
+        numbered = enumerate(rows, start=1)
+        while True:
+            chunk = list(islice(numbered, chunk_size))
+            if not chunk:
+                break
+            report['total'] += len(chunk)
+            self._import_chunk(chunk, default_type, workers, seen, report)
+        report['errors'].sort(key=lambda error: error['row'])
+        return report
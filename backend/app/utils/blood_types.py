@@ -1,35 +1,89 @@
+import numpy as np
+
+# Blood types encoded as 3-bit codes: bit 0 is the Rh(D) antigen, bit 1 the
+# A antigen and bit 2 the B antigen, so O- is 0 and AB+ is 7. A donor can
+# give to a recipient when the donor carries no antigen the recipient lacks,
+# i.e. donor_code & ~recipient_code == 0.
+BLOOD_TYPES = ('O-', 'O+', 'A-', 'A+', 'B-', 'B+', 'AB-', 'AB+')
+BLOOD_TYPE_CODES = {blood_type: code for code, blood_type in enumerate(BLOOD_TYPES)}
+UNKNOWN_BLOOD_TYPE_CODE = len(BLOOD_TYPES)  # matches no mask bit
+
+# 8-bit masks, precomputed once: bit d of RECIPIENT_MASKS[r] is set when
+# donor code d can give to recipient code r, and DONOR_MASKS is the transpose.
+RECIPIENT_MASKS = tuple(
+    sum(1 << donor for donor in range(len(BLOOD_TYPES)) if donor & ~recipient == 0)
+    for recipient in range(len(BLOOD_TYPES))
+)
+DONOR_MASKS = tuple(
+    sum(1 << recipient for recipient in range(len(BLOOD_TYPES)) if donor & ~recipient == 0)
+    for donor in range(len(BLOOD_TYPES))
+)
+
+def _types_in_mask(mask):
+    return [blood_type for code, blood_type in enumerate(BLOOD_TYPES) if mask >> code & 1]
+
+_COMPATIBLE_DONORS = {
+    blood_type: _types_in_mask(RECIPIENT_MASKS[code])
+    for blood_type, code in BLOOD_TYPE_CODES.items()
+}
+_CAN_DONATE_TO = {
+    blood_type: _types_in_mask(DONOR_MASKS[code])
+    for blood_type, code in BLOOD_TYPE_CODES.items()
+}
+
+def get_blood_type_code(blood_type):
+    """Get the integer code for a blood type (UNKNOWN_BLOOD_TYPE_CODE if invalid)."""
+    return BLOOD_TYPE_CODES.get(blood_type, UNKNOWN_BLOOD_TYPE_CODE)
+
 def get_compatible_donors(blood_type):
     """Get list of compatible donor blood types for a given blood type."""
-    compatibility_map = {
-        'O-': ['O-'],
-        'O+': ['O-', 'O+'],
-        'A-': ['O-', 'A-'],
-        'A+': ['O-', 'O+', 'A-', 'A+'],
-        'B-': ['O-', 'B-'],
-        'B+': ['O-', 'O+', 'B-', 'B+'],
-        'AB-': ['O-', 'A-', 'B-', 'AB-'],
-        'AB+': ['O-', 'O+', 'A-', 'A+', 'B-', 'B+', 'AB-', 'AB+']
-    }
-    return compatibility_map.get(blood_type, [])
+    return list(_COMPATIBLE_DONORS.get(blood_type, []))
 
 def can_donate_to(donor_type):
     """Get list of blood types that can receive blood from a given donor type."""
-    compatibility_map = {
-        'O-': ['O-', 'O+', 'A-', 'A+', 'B-', 'B+', 'AB-', 'AB+'],
-        'O+': ['O+', 'A+', 'B+', 'AB+'],
-        'A-': ['A-', 'A+', 'AB-', 'AB+'],
-        'A+': ['A+', 'AB+'],
-        'B-': ['B-', 'B+', 'AB-', 'AB+'],
-        'B+': ['B+', 'AB+'],
-        'AB-': ['AB-', 'AB+'],
-        'AB+': ['AB+']
-    }
-    return compatibility_map.get(donor_type, [])
+    return list(_CAN_DONATE_TO.get(donor_type, []))
 
 def get_all_blood_types():
     """Get list of all blood types."""
-    return ['O-', 'O+', 'A-', 'A+', 'B-', 'B+', 'AB-', 'AB+']
+    return list(BLOOD_TYPES)
 
 def is_compatible(donor_type, recipient_type):
     """Check if donor blood type is compatible with recipient blood type."""
-    return recipient_type in can_donate_to(donor_type) 
\ No newline at end of file
+    recipient_code = BLOOD_TYPE_CODES.get(recipient_type)
+    if recipient_code is None:
+        return False
+    return bool(RECIPIENT_MASKS[recipient_code] >> get_blood_type_code(donor_type) & 1)
+
+def encode_blood_types(blood_types):
+    """Encode a sequence of blood type strings as a uint8 array of codes."""
+    return np.fromiter(
+        (get_blood_type_code(blood_type) for blood_type in blood_types),
+        dtype=np.uint8,
+        count=len(blood_types)
+    )
+
+def blood_type_mask(blood_types):
+    """Get the 8-bit mask with the bit of every given blood type's code set."""
+    mask = 0
+    for blood_type in blood_types:
+        code = BLOOD_TYPE_CODES.get(blood_type)
+        if code is not None:
+            mask |= 1 << code
+    return mask
+
+def codes_in_mask(codes, mask):
+    """Get a boolean array marking which blood type codes have their bit set in mask."""
+    codes = np.asarray(codes, dtype=np.uint8)
+    return (np.right_shift(mask, codes) & 1).astype(bool)
+
+def compatible_donor_mask(donor_codes, recipient_type):
+    """Get a boolean array marking which donor codes can give to recipient_type."""
+    recipient_code = BLOOD_TYPE_CODES.get(recipient_type)
+    mask = RECIPIENT_MASKS[recipient_code] if recipient_code is not None else 0
+    return codes_in_mask(donor_codes, mask)
+
+def compatible_recipient_mask(recipient_codes, donor_type):
+    """Get a boolean array marking which recipient codes can receive from donor_type."""
+    donor_code = BLOOD_TYPE_CODES.get(donor_type)
+    mask = DONOR_MASKS[donor_code] if donor_code is not None else 0
+    return codes_in_mask(recipient_codes, mask)
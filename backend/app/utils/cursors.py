@@ -0,0 +1,22 @@
+import base64
+import json
+
+def encode_cursor(values):
+    """Encode a sequence of JSON-serializable values as an opaque, URL-safe cursor token."""
+    raw = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(token):
+    """Decode a cursor token back into its list of values.
+
+    Raises ValueError if the token is malformed.
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError, AttributeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return values
@@ -1,8 +1,11 @@
-from math import radians, sin, cos, sqrt, atan2
+from math import radians, degrees, sin, cos, sqrt, atan2, asin, pi
+import numpy as np
+
+EARTH_RADIUS = 6371  # Radius of earth in kilometers
 
 def calculate_distance(lat1, lon1, lat2, lon2):
     """
-    Calculate the great circle distance between two points 
+    Calculate the great circle distance between two points
     on the earth (specified in decimal degrees)
     """
     # Convert decimal degrees to radians
@@ -13,12 +16,94 @@ def calculate_distance(lat1, lon1, lat2, lon2):
     dlon = lon2 - lon1
     a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
     c = 2 * atan2(sqrt(a), sqrt(1-a))
-    r = 6371  # Radius of earth in kilometers
+    r = EARTH_RADIUS
 
     return r * c
 
+def _haversine(lat1, lon1, lat2, lon2):
+    """Vectorized haversine over broadcastable arrays of decimal degrees."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat/2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon/2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
+
+    return EARTH_RADIUS * c
+
+def calculate_distances(latitude, longitude, latitudes, longitudes):
+    """
+    Calculate the distances from one point to many points in a single pass.
+
+    latitudes and longitudes are equal-length sequences; missing coordinates
+    (None) yield NaN. Returns a float64 array in kilometers.
+    """
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    return _haversine(
+        np.float64(latitude),
+        np.float64(longitude),
+        latitudes,
+        longitudes
+    )
+
+def distance_matrix(origin_lats, origin_lons, dest_lats, dest_lons):
+    """
+    Calculate an N x M matrix of distances between N origins and M
+    destinations. Missing coordinates (None) yield NaN.
+    """
+    origin_lats = np.asarray(origin_lats, dtype=np.float64)[:, np.newaxis]
+    origin_lons = np.asarray(origin_lons, dtype=np.float64)[:, np.newaxis]
+    dest_lats = np.asarray(dest_lats, dtype=np.float64)[np.newaxis, :]
+    dest_lons = np.asarray(dest_lons, dtype=np.float64)[np.newaxis, :]
+    return _haversine(origin_lats, origin_lons, dest_lats, dest_lons)
+
+def bounding_box(latitude, longitude, radius):
+    """
+    Get the (min_lat, max_lat, min_lon, max_lon) box enclosing every point
+    within radius kilometers of the given point.
+
+    Longitudes can fall outside [-180, 180] when the box crosses the
+    antimeridian; callers are expected to wrap them. When the circle
+    contains a pole the box spans every longitude.
+    """
+    angular_radius = radius / EARTH_RADIUS
+    lat = radians(latitude)
+
+    min_lat = lat - angular_radius
+    max_lat = lat + angular_radius
+
+    if min_lat <= -pi / 2 or max_lat >= pi / 2 or angular_radius >= pi / 2:
+        return (
+            max(degrees(min_lat), -90.0),
+            min(degrees(max_lat), 90.0),
+            -180.0,
+            180.0
+        )
+
+    delta_lon = degrees(asin(sin(angular_radius) / cos(lat)))
+    return (
+        degrees(min_lat),
+        degrees(max_lat),
+        longitude - delta_lon,
+        longitude + delta_lon
+    )
+
+def longitude_ranges(min_lon, max_lon):
+    """
+    Split a bounding box's longitude extent into (low, high) ranges that lie
+    within [-180, 180], wrapping across the antimeridian when needed.
+    """
+    if max_lon - min_lon >= 360:
+        return [(-180.0, 180.0)]
+    if min_lon < -180:
+        return [(min_lon + 360, 180.0), (-180.0, max_lon)]
+    if max_lon > 180:
+        return [(min_lon, 180.0), (-180.0, max_lon - 360)]
+    return [(min_lon, max_lon)]
+
 def format_distance(distance):
     """Format distance in a human-readable way."""
     if distance < 1:
         return f"{int(distance * 1000)}m"
-    return f"{round(distance, 1)}km" 
\ No newline at end of file
+    return f"{round(distance, 1)}km"
\ No newline at end of file
@@ -1,22 +1,6 @@
 from datetime import datetime, timedelta
-from math import radians, sin, cos, sqrt, atan2
-
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """
-    Calculate the great circle distance between two points 
-    on the earth (specified in decimal degrees)
-    """
-    # Convert decimal degrees to radians
-    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-
-    # Haversine formula
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1-a))
-    r = 6371  # Radius of earth in kilometers
-
-    return r * c
+from app.utils.geolocation import calculate_distance
+from app.utils.blood_types import get_compatible_donors, can_donate_to, is_compatible
 
 def format_distance(distance):
     """Format distance in a human-readable way."""
@@ -31,34 +15,6 @@ def can_donate(last_donation_date):
     days_since_donation = (datetime.utcnow() - last_donation_date).days
     return days_since_donation >= 56
 
-def get_compatible_donors(blood_type):
-    """Get list of compatible donor blood types for a given blood type."""
-    compatibility_map = {
-        'O-': ['O-'],
-        'O+': ['O-', 'O+'],
-        'A-': ['O-', 'A-'],
-        'A+': ['O-', 'O+', 'A-', 'A+'],
-        'B-': ['O-', 'B-'],
-        'B+': ['O-', 'O+', 'B-', 'B+'],
-        'AB-': ['O-', 'A-', 'B-', 'AB-'],
-        'AB+': ['O-', 'O+', 'A-', 'A+', 'B-', 'B+', 'AB-', 'AB+']
-    }
-    return compatibility_map.get(blood_type, [])
-
-def can_donate_to(donor_type):
-    """Get list of blood types that can receive blood from a given donor type."""
-    compatibility_map = {
-        'O-': ['O-', 'O+', 'A-', 'A+', 'B-', 'B+', 'AB-', 'AB+'],
-        'O+': ['O+', 'A+', 'B+', 'AB+'],
-        'A-': ['A-', 'A+', 'AB-', 'AB+'],
-        'A+': ['A+', 'AB+'],
-        'B-': ['B-', 'B+', 'AB-', 'AB+'],
-        'B+': ['B+', 'AB+'],
-        'AB-': ['AB-', 'AB+'],
-        'AB+': ['AB+']
-    }
-    return compatibility_map.get(donor_type, [])
-
 def format_date(date):
     """Format date in a human-readable way."""
     return date.strftime("%B %d, %Y")
@@ -0,0 +1,80 @@
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+from app.utils.cursors import decode_cursor, encode_cursor
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+def page_args(args, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Read the `limit` and `cursor` query parameters.
+
+    limit defaults to default, so every listing is paged; clients follow
+    the X-Next-Cursor header to read further.
+    Raises ValueError if limit is not an integer between 1 and maximum.
+    """
+    cursor = args.get('cursor') or None
+    limit = args.get('limit', default)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        limit = 0
+    if not 1 <= limit <= maximum:
+        raise ValueError(f'limit must be an integer between 1 and {maximum}')
+    return limit, cursor
+
+def filter_arg(args, name, choices):
+    """Read an optional query parameter restricted to choices (ValueError if not one of them)."""
+    value = args.get(name)
+    if value is None or value == '':
+        return None
+    if value not in choices:
+        raise ValueError(f'{name} must be one of: {", ".join(choices)}')
+    return value
+
+def encode_keyset_cursor(sort_value, id_value):
+    """Encode the (datetime, id) position of a row as an opaque cursor token."""
+    return encode_cursor([sort_value.isoformat(), id_value])
+
+def decode_keyset_cursor(cursor):
+    """Decode a cursor token into its (datetime, id) position (ValueError if invalid)."""
+    values = decode_cursor(cursor)
+    if len(values) != 2 or not isinstance(values[0], str) or not isinstance(values[1], int):
+        raise ValueError('Invalid cursor')
+    return datetime.fromisoformat(values[0]), values[1]
+
+def keyset_filter(query, sort_column, id_column, cursor):
+    """Keep the rows ordered after cursor in (sort_column desc, id_column desc) order."""
+    if not cursor:
+        return query
+    sort_value, id_value = decode_keyset_cursor(cursor)
+    return query.filter(or_(
+        sort_column < sort_value,
+        and_(sort_column == sort_value, id_column < id_value)
+    ))
+
+def keyset_page(query, sort_column, id_column, limit, cursor=None, key=None):
+    """Get one page of a query, newest first, keyed on (sort_column, id_column).
+
+    Any ordering already on the query is replaced. sort_column must be a
+    DateTime column; key maps a result row to its (sort value, id) and
+    defaults to reading both columns off the row.
+    Returns (items, next_cursor), next_cursor being None on the last page.
+    Raises ValueError for an invalid cursor.
+    """
+    if key is None:
+        key = lambda row: (getattr(row, sort_column.key), getattr(row, id_column.key))
+
+    query = keyset_filter(query, sort_column, id_column, cursor)\
+        .order_by(None)\
+        .order_by(sort_column.desc(), id_column.desc())
+    rows = query.limit(limit + 1).all()
+    items = rows[:limit]
+    next_cursor = encode_keyset_cursor(*key(items[-1])) if len(rows) > limit else None
+    return items, next_cursor
+
+def page_headers(next_cursor):
+    """Response headers carrying the cursor of the next page, if any."""
+    return {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
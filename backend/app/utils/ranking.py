@@ -0,0 +1,16 @@
+import heapq
+
+def top_k(items, key, limit=None, after=None):
+    """
+    Rank items by ascending key and keep the first `limit` of them.
+
+    items may be any iterable (e.g. a generator of scored candidates); with a
+    limit only `limit` items are held at once, in O(N log limit) time. When
+    `after` is given, items whose key is not strictly greater are skipped,
+    which continues a ranking from the last key of a previous page.
+    """
+    if after is not None:
+        items = (item for item in items if key(item) > after)
+    if limit is None:
+        return sorted(items, key=key)
+    return heapq.nsmallest(limit, items, key=key)
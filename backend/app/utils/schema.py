@@ -0,0 +1,79 @@
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.sql.schema import ScalarElementColumnDefault
+
+from app import db
+
+logger = logging.getLogger(__name__)
+
+def _column_ddl(column, dialect):
+    """ADD COLUMN clause for a model column, nullable unless it has a constant default."""
+    ddl = f'{dialect.identifier_preparer.quote(column.name)} {column.type.compile(dialect=dialect)}'
+    default = column.default
+    if isinstance(default, ScalarElementColumnDefault):
+        value = default.arg
+        literal = int(value) if isinstance(value, bool) else value
+        ddl += f' DEFAULT {literal!r}' if isinstance(literal, str) else f' DEFAULT {literal}'
+        if not column.nullable:
+            ddl += ' NOT NULL'
+    return ddl
+
+def _rebuild_user_outbox(connection):
+    """Move events of the old user_id outbox layout to the room layout.
+
+    Events queued before Socket.IO rooms existed targeted a user id; they
+    now go to that user's room.
+    """
+    from app.models.notification import NotificationOutbox
+    outbox = NotificationOutbox.__table__
+    legacy = f'{outbox.name}_legacy'
+    connection.execute(text(f'ALTER TABLE {outbox.name} RENAME TO {legacy}'))
+    for index in inspect(connection).get_indexes(legacy):
+        connection.execute(text(f'DROP INDEX IF EXISTS {index["name"]}'))
+    outbox.create(connection)
+    connection.execute(text(f"""
+        INSERT INTO {outbox.name} (id, room, event, payload, attempts, available_at, created_at)
+        SELECT id, 'user:' || user_id, event, payload, attempts, available_at, created_at
+        FROM {legacy}
+    """))
+    connection.execute(text(f'DROP TABLE {legacy}'))
+
+def upgrade_schema():
+    """Bring tables created by an earlier version up to the current models.
+
+    db.create_all only creates missing tables, so columns and indexes added
+    to existing tables are added here. Safe to run at every startup: it
+    only touches what is missing.
+    """
+    engine = db.engine
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        existing = set(inspector.get_table_names())
+        added = set()
+
+        if 'notification_outbox' in existing and 'room' not in {
+                column['name'] for column in inspector.get_columns('notification_outbox')}:
+            logger.info("Upgrading notification_outbox to room delivery")
+            _rebuild_user_outbox(connection)
+            inspector = inspect(connection)
+
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing:
+                continue
+            columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    logger.info(f"Adding column {table.name}.{column.name}")
+                    connection.execute(text(
+                        f'ALTER TABLE {table.name} ADD COLUMN {_column_ddl(column, engine.dialect)}'
+                    ))
+                    added.add(f'{table.name}.{column.name}')
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
+        # Digests created before updated_at existed were last updated when created
+        if 'notification.updated_at' in added:
+            connection.execute(text(
+                'UPDATE notification SET updated_at = created_at WHERE updated_at IS NULL'
+            ))
@@ -0,0 +1,55 @@
+import json
+
+from flask import Response, stream_with_context
+
+EXPORT_FORMATS = ('json', 'ndjson')
+EXPORT_CHUNK_SIZE = 1000  # Rows fetched from the database and written per chunk
+
+def _dumps(item):
+    return json.dumps(item, separators=(',', ':'))
+
+def iter_json_array(rows, serialize, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield a JSON array of serialized rows, chunk_size rows at a time."""
+    yield '['
+    chunk = []
+    first = True
+    for row in rows:
+        chunk.append(_dumps(serialize(row)))
+        if len(chunk) == chunk_size:
+            yield ('' if first else ',') + ','.join(chunk)
+            chunk, first = [], False
+    if chunk:
+        yield ('' if first else ',') + ','.join(chunk)
+    yield ']'
+
+def iter_ndjson(rows, serialize, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield newline-delimited JSON of serialized rows, chunk_size rows at a time."""
+    chunk = []
+    for row in rows:
+        chunk.append(_dumps(serialize(row)))
+        if len(chunk) == chunk_size:
+            yield '\n'.join(chunk) + '\n'
+            chunk = []
+    if chunk:
+        yield '\n'.join(chunk) + '\n'
+
+def stream_query(query, serialize, format='json', filename=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Stream every row of a query as a JSON array or NDJSON response.
+
+    Rows are fetched with yield_per and written chunk by chunk, so memory
+    stays bounded by chunk_size whatever the result size. format must be
+    one of EXPORT_FORMATS.
+    """
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f'format must be one of: {", ".join(EXPORT_FORMATS)}')
+
+    rows = query.yield_per(chunk_size)
+    if format == 'ndjson':
+        body, mimetype = iter_ndjson(rows, serialize, chunk_size), 'application/x-ndjson'
+    else:
+        body, mimetype = iter_json_array(rows, serialize, chunk_size), 'application/json'
+
+    headers = {}
+    if filename:
+        headers['Content-Disposition'] = f'attachment; filename="{filename}.{format}"'
+    return Response(stream_with_context(body), mimetype=mimetype, headers=headers)
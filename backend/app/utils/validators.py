@@ -1,5 +1,6 @@
 import re
 from datetime import datetime
+from app.utils.blood_types import BLOOD_TYPE_CODES
 
 def validate_email(email):
     """Validate email format."""
@@ -13,8 +14,7 @@ def validate_phone(phone):
 
 def validate_blood_type(blood_type):
     """Validate blood type format."""
-    valid_types = ['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-']
-    return blood_type in valid_types
+    return isinstance(blood_type, str) and blood_type in BLOOD_TYPE_CODES
 
 def validate_coordinates(lat, lon):
     """Validate latitude and longitude."""
@@ -0,0 +1,57 @@
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import create_app, db
+from app.config import Config
+from app.models import BloodRequest, Donor, Hospital
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "test.db"}'
+        NOTIFICATION_DISPATCHER_ENABLED = False
+        NOTIFICATION_RETENTION_ENABLED = False
+        NOTIFICATION_COALESCE_WINDOW = 0
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def hospital(app):
+    hospital = Hospital(email='hospital@example.com', password_hash='x', name='General',
+                        address='1 Main St', latitude=40.0, longitude=-74.0)
+    db.session.add(hospital)
+    db.session.commit()
+    return hospital
+
+@pytest.fixture
+def donors(app):
+    donors = [
+        Donor(email=f'donor{i}@example.com', password_hash='x', name=f'Donor {i}',
+              blood_type=('O-', 'A+', 'B+')[i % 3], latitude=40.0 + i * 0.001, longitude=-74.0)
+        for i in range(12)
+    ]
+    db.session.add_all(donors)
+    db.session.commit()
+    return donors
+
+@pytest.fixture
+def blood_requests(hospital):
+    requests = [
+        BloodRequest(hospital_id=hospital.id, blood_type='A+', units_needed=1,
+                     urgency_level='normal', status='open')
+        for _ in range(60)
+    ]
+    db.session.add_all(requests)
+    db.session.commit()
+    return requests
+
+def auth_headers(user):
+    return {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
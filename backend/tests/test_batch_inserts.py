@@ -0,0 +1,37 @@
+from app import db
+from app.models import Donation
+from app.models.notification import Notification
+from app.services.notification import NotificationService
+
+from tests.conftest import auth_headers
+
+def test_notification_ids_follow_user_order(donors):
+    user_ids = [donor.id for donor in reversed(donors)]
+
+    notification_ids = NotificationService().create_notifications(
+        user_ids, 'blood_request', {'hospital_name': 'General', 'blood_type': 'A+'}
+    )
+
+    owners = dict(db.session.query(Notification.id, Notification.user_id))
+    assert [owners[notification_id] for notification_id in notification_ids] == user_ids
+
+def test_batch_donation_ids_follow_record_order(client, hospital, donors):
+    records = [
+        {'donor_id': donor.id, 'units': 1 + i % 2, 'donation_date': f'2026-01-{10 + i % 5}T09:00:00',
+         'notes': 'walk-in' if i % 3 else None}
+        for i, donor in enumerate(reversed(donors))
+    ]
+    records.append(dict(records[0]))  # identical records are interchangeable
+
+    response = client.post('/api/hospital/donations/batch', headers=auth_headers(hospital),
+                           json={'donations': records})
+
+    assert response.status_code == 201
+    donation_ids = response.json['donation_ids']
+    assert len(set(donation_ids)) == len(records)
+    for record, donation_id in zip(records, donation_ids):
+        donation = db.session.get(Donation, donation_id)
+        assert donation.donor_id == record['donor_id']
+        assert donation.units == record['units']
+        assert donation.notes == record['notes']
+        assert donation.donation_date.isoformat() == record['donation_date']
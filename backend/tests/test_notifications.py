@@ -0,0 +1,52 @@
+import pytest
+
+from app.services.notification import NotificationService
+
+from tests.conftest import auth_headers
+
+@pytest.fixture
+def inbox(donors):
+    service = NotificationService()
+    donor = donors[0]
+    notification_ids = [service.create_notification(donor.id, 'donation_reminder', {}).id for _ in range(3)]
+    return service, donor, notification_ids
+
+def test_feed_is_a_json_array_with_paging_headers(client, inbox):
+    _, donor, _ = inbox
+
+    response = client.get('/api/notifications/notifications?limit=2', headers=auth_headers(donor))
+
+    assert response.status_code == 200
+    assert isinstance(response.json, list) and len(response.json) == 2
+    assert response.headers['X-Unread-Count'] == '3'
+    assert response.headers['X-Next-Cursor']
+
+@pytest.mark.parametrize('query', ['limit=abc', 'limit=-5', 'limit=500'])
+def test_feed_rejects_malformed_limits(client, inbox, query):
+    _, donor, _ = inbox
+
+    response = client.get(f'/api/notifications/notifications?{query}', headers=auth_headers(donor))
+
+    assert response.status_code == 400
+
+def test_unread_count_drops_once_per_notification(inbox):
+    service, donor, notification_ids = inbox
+
+    assert service.mark_as_read(notification_ids[0], donor.id)
+    assert service.mark_as_read(notification_ids[0], donor.id)
+    assert service.get_unread_count(donor.id) == 2
+
+    assert service.delete_notification(notification_ids[0], donor.id)
+    assert service.get_unread_count(donor.id) == 2
+    assert service.delete_notification(notification_ids[1], donor.id)
+    assert not service.delete_notification(notification_ids[1], donor.id)
+    assert service.get_unread_count(donor.id) == 1
+
+@pytest.mark.parametrize('ids', [[True], [], list(range(1001)), '1'])
+def test_bulk_mark_read_rejects_invalid_ids(client, inbox, ids):
+    _, donor, _ = inbox
+
+    response = client.post('/api/notifications/notifications/read', headers=auth_headers(donor),
+                           json={'notification_ids': ids})
+
+    assert response.status_code == 400
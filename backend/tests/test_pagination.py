@@ -0,0 +1,31 @@
+import pytest
+
+from app.utils.pagination import DEFAULT_PAGE_SIZE, NEXT_CURSOR_HEADER
+
+from tests.conftest import auth_headers
+
+def test_listing_is_paged_by_default(client, hospital, blood_requests):
+    response = client.get('/api/hospital/requests', headers=auth_headers(hospital))
+
+    assert response.status_code == 200
+    assert len(response.json) == DEFAULT_PAGE_SIZE
+    assert response.headers[NEXT_CURSOR_HEADER]
+
+def test_cursor_walks_every_row_once(client, hospital, blood_requests):
+    seen, cursor = [], None
+    while True:
+        url = '/api/hospital/requests?limit=7' + (f'&cursor={cursor}' if cursor else '')
+        response = client.get(url, headers=auth_headers(hospital))
+        seen += [item['id'] for item in response.json]
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            break
+
+    expected = sorted(blood_requests, key=lambda r: (r.created_at, r.id), reverse=True)
+    assert seen == [r.id for r in expected]
+
+@pytest.mark.parametrize('query', ['limit=0', 'limit=-5', 'limit=abc', 'limit=201', 'cursor=zzz'])
+def test_malformed_page_arguments_are_rejected(client, hospital, query):
+    response = client.get(f'/api/hospital/requests?{query}', headers=auth_headers(hospital))
+
+    assert response.status_code == 400